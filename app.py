@@ -1,15 +1,29 @@
 import streamlit as st
-import cv2
-import numpy as np
-from PIL import Image
-import io
-import base64
-from utils.filters import ImageFilters
+from utils.metrics import METRICS
+from utils.jobs import JobQueue, QueueFull
+from utils.startup import lazy_import, warm_up_in_background
+from utils.user_store import StoreBusy, create_user_store
+import config
 import os
-import json
-import requests
+import time
+import cProfile
+import uuid
+import logging
 from urllib.parse import urlencode
-from datetime import datetime
+
+# Image stack: imported on first use so the login page loads without OpenCV,
+# numpy or the filters
+buffers = lazy_import('utils.buffers')
+image_io = lazy_import('utils.image_io')
+preview = lazy_import('utils.preview')
+caching = lazy_import('utils.cache')
+pipelines = lazy_import('utils.pipeline')
+
+# Periodic latency summaries from utils.metrics go to stderr
+metrics_logger = logging.getLogger('utils.metrics')
+if not metrics_logger.handlers:
+    metrics_logger.addHandler(logging.StreamHandler())
+    metrics_logger.setLevel(logging.INFO)
 
 # --- Google OAuth Configuration ---
 GOOGLE_CLIENT_ID = "your-google-client-id.apps.googleusercontent.com"  # Replace with your actual client ID
@@ -29,6 +43,8 @@ def google_oauth_url():
 
 def handle_google_callback(code):
     """Handle Google OAuth callback"""
+    # Only the OAuth callback needs requests, so the login page does not import it
+    import requests
     try:
         # Exchange code for tokens
         token_url = "https://oauth2.googleapis.com/token"
@@ -59,24 +75,10 @@ def handle_google_callback(code):
     return None
 
 # --- User management ---
-def load_users():
-    """Load users from JSON file or return default users."""
-    try:
-        with open('users.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Default users for demo
-        default_users = {
-            'admin': 'admin123',
-            'user': 'user123'
-        }
-        save_users(default_users)
-        return default_users
-
-def save_users(users):
-    """Save users to JSON file."""
-    with open('users.json', 'w') as f:
-        json.dump(users, f, indent=4)
+@st.cache_resource
+def get_user_store():
+    """User store (and its database connection) shared by every session."""
+    return create_user_store(config.USER_STORE_BACKEND, config.USER_DB_PATH, config.LEGACY_USERS_JSON)
 
 def signup_page():
     st.markdown('<h1 class="main-header">📝 Sign Up</h1>', unsafe_allow_html=True)
@@ -103,26 +105,26 @@ def signup_page():
             back_to_login = st.form_submit_button("Back to Login")
         
         if submit_signup:
-            users = load_users()
+            user_store = get_user_store()
             
-            if not new_username or not new_password or not new_email:
-                st.error("Username, email and password are required!")
-            elif new_username in users:
-                st.error("Username already exists! Please choose a different one.")
-            elif new_password != confirm_password:
-                st.error("Passwords do not match!")
-            elif len(new_password) < 6:
-                st.error("Password must be at least 6 characters long!")
-            else:
-                users[new_username] = {
-                    'password': new_password,
-                    'email': new_email,
-                    'created_at': str(datetime.now())
-                }
-                save_users(users)
-                st.success("Account created successfully! You can now login.")
-                st.session_state['show_signup'] = False
-                st.rerun()
+            try:
+                if not new_username or not new_password or not new_email:
+                    st.error("Username, email and password are required!")
+                elif user_store.get_user(new_username) is not None:
+                    st.error("Username already exists! Please choose a different one.")
+                elif new_password != confirm_password:
+                    st.error("Passwords do not match!")
+                elif len(new_password) < 6:
+                    st.error("Password must be at least 6 characters long!")
+                elif not user_store.add_user(new_username, new_password, new_email):
+                    # Lost a race with a concurrent signup for the same name
+                    st.error("Username already exists! Please choose a different one.")
+                else:
+                    st.success("Account created successfully! You can now login.")
+                    st.session_state['show_signup'] = False
+                    st.rerun()
+            except StoreBusy as e:
+                st.warning(str(e))
         
         if back_to_login:
             st.session_state['show_signup'] = False
@@ -149,29 +151,29 @@ def login_page():
         signup_page()
         return
     
+    # Opening the store starts any legacy import while the form is filled in
+    get_user_store()
+    
     with st.form("login_form"):
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         login_btn = st.form_submit_button("Login")
         
         if login_btn:
-            users = load_users()
-            if username in users:
-                user_data = users[username]
-                if isinstance(user_data, str):  # Old format
-                    stored_password = user_data
-                else:  # New format
-                    stored_password = user_data.get('password', '')
-                
-                if stored_password == password:
-                    st.session_state['logged_in'] = True
-                    st.session_state['username'] = username
-                    st.success("Login successful! Redirecting...")
-                    st.rerun()
+            user_store = get_user_store()
+            try:
+                if user_store.get_user(username) is not None:
+                    if user_store.verify_password(username, password):
+                        st.session_state['logged_in'] = True
+                        st.session_state['username'] = username
+                        st.success("Login successful! Redirecting...")
+                        st.rerun()
+                    else:
+                        st.error("Invalid password!")
                 else:
-                    st.error("Invalid password!")
-            else:
-                st.error("Username not found!")
+                    st.error("Username not found!")
+            except StoreBusy as e:
+                st.warning(str(e))
 
 # Page configuration
 st.set_page_config(
@@ -223,6 +225,243 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_decode_cache():
+    """Decode cache shared by every session on this server."""
+    disk = None
+    if config.DECODE_MMAP_DIR:
+        disk = caching.DiskCache(config.DECODE_MMAP_DIR, config.DECODE_MMAP_MAX_BYTES)
+        METRICS.register_cache('decode_disk', disk)
+    cache = image_io.DecodeCache(config.DECODE_CACHE_MAX_BYTES, disk)
+    METRICS.register_cache('decode', cache)
+    return cache
+
+@st.cache_resource
+def get_encode_cache():
+    """Encoded download bytes shared by every session on this server."""
+    cache = image_io.EncodeCache(config.ENCODE_CACHE_MAX_BYTES)
+    METRICS.register_cache('encode', cache)
+    return cache
+
+@st.cache_resource
+def get_preview_service():
+    """Display previews shared by every session on this server."""
+    service = preview.PreviewService(
+        config.PREVIEW_CACHE_MAX_BYTES,
+        config.PREVIEW_IMAGE_WIDTH,
+        config.PREVIEW_IMAGE_FORMAT,
+        config.PREVIEW_IMAGE_QUALITY
+    )
+    METRICS.register_cache('preview', service)
+    return service
+
+@st.cache_resource
+def start_warm_up():
+    """Warm the image stack in the background; runs on the first page view of this server process."""
+    return warm_up_in_background()
+
+@st.cache_resource
+def get_job_queue():
+    """Worker pool that runs filter renders for every session on this server."""
+    return JobQueue(config.JOB_WORKERS, config.JOB_MAX_PENDING)
+
+@st.cache_resource
+def get_stage_cache():
+    """Pipeline stage results shared by every session, backed by an on-disk tier."""
+    disk = None
+    if config.RESULT_DISK_CACHE_MAX_BYTES:
+        disk = caching.DiskCache(
+            config.RESULT_DISK_CACHE_DIR,
+            config.RESULT_DISK_CACHE_MAX_BYTES,
+            compress=config.RESULT_DISK_CACHE_COMPRESS
+        )
+        METRICS.register_cache('stage_disk', disk)
+    cache = caching.TieredCache(caching.ByteLRUCache(config.STAGE_CACHE_MAX_BYTES), disk)
+    METRICS.register_cache('stage', cache)
+    return cache
+
+# --- Preview proxy ---
+def working_image(original_image):
+    """Return the image interactive filters run on and its scale relative to the original."""
+    pyramid = st.session_state.get('preview_pyramid')
+    if st.session_state.get('preview_mode') and pyramid:
+        level = preview.select_level(pyramid, config.PREVIEW_DISPLAY_WIDTH)
+        return level, level.shape[1] / original_image.shape[1]
+    return original_image, 1.0
+
+# --- Background rendering ---
+def submit_render(slot, image, scale):
+    """Render the filter stack for ``slot`` ('processed' or 'full') on the shared job queue.
+
+    Returns ``(result, key)`` straight away when there is nothing to compute
+    or the result is already cached; otherwise stores the job handle under
+    ``<slot>_job`` and returns None. Raises QueueFull when no job could be started.
+    """
+    pipeline = pipelines.Pipeline(st.session_state.pipeline.steps)
+    input_key = f"{st.session_state.image_key}:{image.shape[1]}x{image.shape[0]}"
+    cache = get_stage_cache()
+    keys = pipeline.stage_keys(input_key, scale)
+    owner = (st.session_state.session_id, slot)
+    if not keys or keys[-1] in cache:
+        get_job_queue().release(owner)
+        st.session_state[f'{slot}_job'] = None
+        return pipeline.run(image, input_key, cache, scale)
+    job = get_job_queue().submit(
+        owner,
+        keys[-1],
+        lambda report, is_cancelled: pipeline.run(image, input_key, cache, scale, report, is_cancelled)
+    )
+    st.session_state[f'{slot}_job'] = job
+    return None
+
+def collect_render(slot):
+    """Return ``(result, key)`` once the slot's job has finished, None while it is running."""
+    job = st.session_state.get(f'{slot}_job')
+    if job is None or not job.done():
+        return None
+    st.session_state[f'{slot}_job'] = None
+    if job.future.cancelled():
+        return None
+    try:
+        return job.result()
+    except pipelines.PipelineCancelled:
+        return None
+    except Exception as e:
+        st.error(f"Filter failed: {str(e)}")
+        return None
+
+def render_pending(slot):
+    return st.session_state.get(f'{slot}_job') is not None
+
+def poll_pending_jobs():
+    """Rerun shortly while a render job is outstanding so its result gets picked up."""
+    if render_pending('processed') or render_pending('full'):
+        time.sleep(config.JOB_POLL_INTERVAL)
+        st.rerun()
+
+def render_processed_image():
+    """Recompute the displayed result after the filter stack or preview setting changed.
+
+    Returns False when the job queue was full and nothing was started.
+    """
+    pipeline = st.session_state.pipeline
+    image, scale = working_image(st.session_state.original_image)
+    st.session_state.full_render = None
+    get_job_queue().release((st.session_state.session_id, 'full'))
+    st.session_state.full_job = None
+    try:
+        rendered = submit_render('processed', image, scale)
+    except QueueFull:
+        st.warning("⏳ The server is busy, please try again in a moment.")
+        # The image on screen is not of this stack: render again on the next rerun
+        st.session_state.processed_scale = None
+        return False
+    st.session_state.processed_scale = scale
+    st.session_state.current_filter = " → ".join(pipeline.labels()) if len(pipeline) else "Original"
+    if rendered is not None:
+        st.session_state.processed_image, st.session_state.processed_key = rendered
+    return True
+
+def run_filter(name, label, **params):
+    """Add a step to the filter stack (or replace the one being edited) and re-render."""
+    pipeline = st.session_state.pipeline
+    previous_steps = list(pipeline.steps)
+    edit_index = st.session_state.get('edit_step_select')
+    if edit_index is not None and edit_index < len(pipeline):
+        pipeline.replace(edit_index, name, params, label)
+    else:
+        pipeline.append(name, params, label)
+    if not render_processed_image():
+        # Undo the edit so clicking again does not stack a duplicate step
+        pipeline.steps[:] = previous_steps
+
+def sync_processed_image():
+    """Pick up finished renders and re-render when the preview setting changed the resolution."""
+    finished = collect_render('processed')
+    if finished is not None:
+        st.session_state.processed_image, st.session_state.processed_key = finished
+    _, scale = working_image(st.session_state.original_image)
+    if st.session_state.get('processed_scale') != scale:
+        render_processed_image()
+
+def request_full_resolution():
+    """Return ``(image, key)`` at full resolution, or None while it is still being rendered."""
+    if render_pending('processed'):
+        return None
+    if st.session_state.get('processed_scale', 1.0) == 1.0:
+        return st.session_state.processed_image, st.session_state.processed_key
+    if st.session_state.get('full_render') is None:
+        finished = collect_render('full')
+        if finished is None and not render_pending('full'):
+            try:
+                finished = submit_render('full', st.session_state.original_image, 1.0)
+            except QueueFull:
+                st.warning("⏳ The server is busy, please try again in a moment.")
+        st.session_state.full_render = finished
+    return st.session_state.full_render
+
+def filter_stack_panel():
+    """Sidebar controls for inspecting and editing the filter stack."""
+    pipeline = st.session_state.pipeline
+    st.markdown("---")
+    st.subheader("🧱 Filter Stack")
+    if not len(pipeline):
+        st.caption("No filters applied yet. Each filter you apply is added on top of the previous ones.")
+        return
+    options = [None] + list(range(len(pipeline)))
+    edit_index = st.selectbox(
+        "Apply next filter to",
+        options,
+        format_func=lambda index: "➕ New step on top" if index is None else f"✏️ Replace step {index + 1}: {pipeline.steps[index]['label']}",
+        key="edit_step_select"
+    )
+    for index, label in enumerate(pipeline.labels()):
+        st.write(f"{index + 1}. {label}")
+    if edit_index is not None and st.button("🗑️ Remove Selected Step"):
+        pipeline.remove(edit_index)
+        st.session_state.pop('edit_step_select', None)
+        render_processed_image()
+        st.rerun()
+
+def show_image(image_key, image):
+    """Send the cached display preview of ``image`` to the browser."""
+    data = get_preview_service().get(image_key, image)
+    with METRICS.span('transfer'):
+        st.image(data, use_container_width=True)
+    METRICS.inc('bytes_sent_total', len(data))
+
+# --- Session memory ---
+def track_session_memory():
+    """Report the buffers this session pins and warn when it is over its budget."""
+    usage = buffers.memory_usage(st.session_state.to_dict().values())
+    buffers.SESSION_MEMORY.update(st.session_state.session_id, usage)
+    budget = config.SESSION_MEMORY_BUDGET
+    with st.sidebar:
+        st.caption(
+            f"💾 Session memory: {usage['resident'] / 2**20:.0f} MB"
+            + (f" (+{usage['mapped'] / 2**20:.0f} MB mapped)" if usage['mapped'] else "")
+        )
+        if budget and usage['resident'] > budget:
+            st.warning(f"⚠️ This session is over its {budget / 2**20:.0f} MB memory budget; reset or use a smaller image.")
+
+# --- Admin panel ---
+def admin_panel():
+    """Latency percentiles, cache statistics and the Prometheus export for admins."""
+    if st.session_state.get('username') not in config.ADMIN_USERS:
+        return
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("📈 Performance"):
+            st.write("**Latency per stage**")
+            st.dataframe(METRICS.latency_summary(), use_container_width=True)
+            st.write("**Caches**")
+            st.dataframe(
+                [{'cache': name, **stats} for name, stats in METRICS.cache_stats().items()],
+                use_container_width=True
+            )
+            st.write("**Prometheus export**")
+            st.code(METRICS.prometheus_text(), language="text")
+
 # --- Main App ---
 def main():
     st.markdown('<h1 class="main-header">🎨 Image Filter App</h1>', unsafe_allow_html=True)
@@ -249,10 +488,22 @@ def main():
                 "Crop & Resize"
             ]
         )
+        st.checkbox(
+            "⚡ Fast preview",
+            value=config.PREVIEW_ENABLED,
+            key="preview_mode",
+            help="Preview filters at display resolution; full resolution is rendered for download"
+        )
         if 'original_image' not in st.session_state:
             st.session_state.original_image = None
         if 'processed_image' not in st.session_state:
             st.session_state.processed_image = None
+        if 'pipeline' not in st.session_state:
+            st.session_state.pipeline = pipelines.Pipeline()
+        if 'full_render' not in st.session_state:
+            st.session_state.full_render = None
+        if 'session_id' not in st.session_state:
+            st.session_state.session_id = uuid.uuid4().hex
         if 'current_filter' not in st.session_state:
             st.session_state.current_filter = None
         if 'crop_coords' not in st.session_state:
@@ -264,32 +515,54 @@ def main():
     # Upload section
     uploaded_file = st.file_uploader(
         "Choose an image file",
-        type=['png', 'jpg', 'jpeg', 'bmp', 'tiff'],
+        type=config.SUPPORTED_FORMATS,
         help="Upload an image to apply filters"
     )
     
     if uploaded_file is not None:
-        image = Image.open(uploaded_file)
-        image_array = np.array(image)
-        if len(image_array.shape) == 3 and image_array.shape[2] == 4:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
-        st.session_state.original_image = image_array
-        st.session_state.processed_image = image_array.copy()
+        # Only hash and decode when a different file arrives; slider moves and
+        # button clicks rerun the script with the same upload.
+        upload_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('upload_id') != upload_id:
+            try:
+                image_key, image_array = get_decode_cache().load(uploaded_file.getvalue(), config.MAX_WORKING_PIXELS)
+            except (ValueError, OSError) as e:
+                st.error(f"Could not read image: {str(e)}")
+                return
+            if st.session_state.get('image_key') != image_key:
+                pyramid = preview.build_pyramid(image_array, config.PREVIEW_DISPLAY_WIDTH)
+                if config.SESSION_MEMORY_BUDGET and buffers.memory_usage([image_array, pyramid])['resident'] > config.SESSION_MEMORY_BUDGET:
+                    st.error("Image is too large for the per-user memory budget; please upload a smaller image.")
+                    return
+                # The decoded array is read-only and shared, so no per-session copy
+                st.session_state.image_key = image_key
+                st.session_state.original_image = image_array
+                st.session_state.preview_pyramid = pyramid
+                st.session_state.pipeline.clear()
+                st.session_state.processed_scale = None
+                st.session_state.full_render = None
+                st.session_state.current_filter = None
+            st.session_state.upload_id = upload_id
         st.success("✅ Image uploaded successfully!")
     
     # Image display section - always show both images side by side
     if st.session_state.original_image is not None:
+        sync_processed_image()
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📤 Original Image")
-            st.image(st.session_state.original_image, channels="RGB", use_container_width=True)
+            display_original, _ = working_image(st.session_state.original_image)
+            show_image(st.session_state.image_key, display_original)
         
         with col2:
             st.subheader("🎯 Processed Image")
             apply_filters(filter_type, st.session_state.original_image)
+            job = st.session_state.get('processed_job')
+            if job is not None:
+                st.progress(job.progress, text="⏳ Applying filters...")
             if st.session_state.processed_image is not None:
-                st.image(st.session_state.processed_image, channels="RGB", use_container_width=True)
+                show_image(st.session_state.processed_key, st.session_state.processed_image)
                 download_processed_image()
     else:
         # Show placeholder when no image is uploaded
@@ -306,128 +579,164 @@ def apply_filters(filter_type, original_image):
         if filter_type == "Basic Filters":
             st.subheader("🔧 Basic Filters")
             if st.button("Grayscale"):
-                st.session_state.processed_image = ImageFilters.apply_grayscale(original_image)
-                st.session_state.current_filter = "Grayscale"
+                run_filter('grayscale', "Grayscale")
             if st.button("Sepia"):
-                st.session_state.processed_image = ImageFilters.apply_sepia(original_image)
-                st.session_state.current_filter = "Sepia"
+                run_filter('sepia', "Sepia")
             if st.button("Blur"):
                 kernel_size = st.slider("Blur Intensity", 3, 31, 15, step=2)
-                st.session_state.processed_image = ImageFilters.apply_blur(original_image, kernel_size)
-                st.session_state.current_filter = f"Blur (Kernel: {kernel_size})"
+                run_filter('blur', f"Blur (Kernel: {kernel_size})", kernel_size=kernel_size)
             if st.button("Sharpen"):
-                st.session_state.processed_image = ImageFilters.apply_sharpen(original_image)
-                st.session_state.current_filter = "Sharpen"
+                run_filter('sharpen', "Sharpen")
             if st.button("Edge Detection"):
-                st.session_state.processed_image = ImageFilters.apply_edge_detection(original_image)
-                st.session_state.current_filter = "Edge Detection"
+                run_filter('edge_detection', "Edge Detection")
             if st.button("Invert"):
-                st.session_state.processed_image = ImageFilters.apply_invert(original_image)
-                st.session_state.current_filter = "Invert"
+                run_filter('invert', "Invert")
         elif filter_type == "Artistic Effects":
             st.subheader("🎨 Artistic Effects")
             if st.button("Cartoon"):
-                st.session_state.processed_image = ImageFilters.apply_cartoon(original_image)
-                st.session_state.current_filter = "Cartoon"
+                run_filter('cartoon', "Cartoon")
             if st.button("Vintage"):
-                st.session_state.processed_image = ImageFilters.apply_vintage(original_image)
-                st.session_state.current_filter = "Vintage"
+                run_filter('vintage', "Vintage")
             if st.button("Emboss"):
-                st.session_state.processed_image = ImageFilters.apply_emboss(original_image)
-                st.session_state.current_filter = "Emboss"
+                run_filter('emboss', "Emboss")
             if st.button("Pencil Sketch"):
-                st.session_state.processed_image = ImageFilters.apply_pencil_sketch(original_image)
-                st.session_state.current_filter = "Pencil Sketch"
+                run_filter('pencil_sketch', "Pencil Sketch")
             if st.button("HDR Effect"):
-                st.session_state.processed_image = ImageFilters.apply_hdr(original_image)
-                st.session_state.current_filter = "HDR Effect"
+                run_filter('hdr', "HDR Effect")
             if st.button("Color Splash"):
-                st.session_state.processed_image = ImageFilters.apply_color_splash(original_image)
-                st.session_state.current_filter = "Color Splash"
+                run_filter('color_splash', "Color Splash")
         elif filter_type == "Adjustments":
             st.subheader("⚙️ Adjustments")
             brightness = st.slider("Brightness", -100, 100, 0)
             contrast = st.slider("Contrast", -100, 100, 0)
             if st.button("Apply Brightness/Contrast"):
-                st.session_state.processed_image = ImageFilters.apply_brightness_contrast(
-                    original_image, brightness, contrast
+                run_filter(
+                    'brightness_contrast',
+                    f"Brightness: {brightness}, Contrast: {contrast}",
+                    brightness=brightness, contrast=contrast
                 )
-                st.session_state.current_filter = f"Brightness: {brightness}, Contrast: {contrast}"
             st.subheader("🎨 Color Balance")
             red_adj = st.slider("Red", -50, 50, 0)
             green_adj = st.slider("Green", -50, 50, 0)
             blue_adj = st.slider("Blue", -50, 50, 0)
             if st.button("Apply Color Balance"):
-                st.session_state.processed_image = ImageFilters.apply_color_balance(
-                    original_image, red_adj, green_adj, blue_adj
+                run_filter(
+                    'color_balance',
+                    f"Color Balance (R:{red_adj}, G:{green_adj}, B:{blue_adj})",
+                    red=red_adj, green=green_adj, blue=blue_adj
                 )
-                st.session_state.current_filter = f"Color Balance (R:{red_adj}, G:{green_adj}, B:{blue_adj})"
             if st.button("Histogram Equalization"):
-                st.session_state.processed_image = ImageFilters.apply_histogram_equalization(original_image)
-                st.session_state.current_filter = "Histogram Equalization"
+                run_filter('histogram_equalization', "Histogram Equalization")
         elif filter_type == "Transformations":
             st.subheader("🔄 Transformations")
             rotation_angle = st.slider("Rotation Angle", -180, 180, 0)
             if st.button("Rotate"):
-                st.session_state.processed_image = ImageFilters.apply_rotate(original_image, rotation_angle)
-                st.session_state.current_filter = f"Rotate {rotation_angle}°"
+                run_filter('rotate', f"Rotate {rotation_angle}°", angle=rotation_angle)
             mirror_direction = st.selectbox("Mirror Direction", ["horizontal", "vertical"])
             if st.button("Mirror"):
-                st.session_state.processed_image = ImageFilters.apply_mirror(original_image, mirror_direction)
-                st.session_state.current_filter = f"Mirror {mirror_direction}"
+                run_filter('mirror', f"Mirror {mirror_direction}", direction=mirror_direction)
             scale_factor = st.slider("Scale Factor", 0.1, 3.0, 1.0, 0.1)
             if st.button("Resize"):
-                st.session_state.processed_image = ImageFilters.apply_resize(original_image, scale=scale_factor)
-                st.session_state.current_filter = f"Resize {scale_factor}x"
+                run_filter('resize', f"Resize {scale_factor}x", scale=scale_factor)
         elif filter_type == "Noise & Effects":
             st.subheader("📊 Noise & Effects")
             noise_type = st.selectbox("Noise Type", ["gaussian", "salt_pepper", "poisson"])
             noise_intensity = st.slider("Noise Intensity", 0.01, 0.5, 0.1, 0.01)
+            # Without a seed the noise comes from ImageFilters.apply_noise; a seed
+            # makes it reproducible across renders and lets its field be cached
+            noise_seed = None
+            if st.checkbox("Fixed noise seed", key="noise_seeded",
+                           help="Seeded noise uses the app's own noise model: Poisson noise is "
+                                "approximated by Gaussian noise scaled to the pixel value"):
+                noise_seed = int(st.number_input("Noise Seed", 0, 2**31 - 1, config.DEFAULT_PARAMS['noise_seed']))
             if st.button("Add Noise"):
-                st.session_state.processed_image = ImageFilters.apply_noise(
-                    original_image, noise_type, noise_intensity
+                seed_label = "" if noise_seed is None else f", seed {noise_seed}"
+                run_filter(
+                    'noise',
+                    f"{noise_type.title()} Noise ({noise_intensity}{seed_label})",
+                    noise_type=noise_type, intensity=noise_intensity, seed=noise_seed
                 )
-                st.session_state.current_filter = f"{noise_type.title()} Noise ({noise_intensity})"
         elif filter_type == "Crop & Resize":
             st.subheader("✂️ Crop & Resize")
             
-            # Get image dimensions
-            height, width = original_image.shape[:2]
+            # Size of the image this step receives: the output of the step
+            # before the one being edited, or of the whole stack when adding
+            pipeline = st.session_state.pipeline
+            edit_index = st.session_state.get('edit_step_select')
+            upto = edit_index if edit_index is not None and edit_index < len(pipeline) else None
+            height, width = pipeline.output_size(original_image.shape, upto)[:2]
+            # Keys carry the size so the widgets reset when earlier steps change it
+            size_key = f"{width}x{height}"
             
-            # Crop controls
+            # Crop controls (always in full-resolution coordinates)
             st.write("**Crop Image:**")
-            crop_left = st.slider("Left", 0, width, 0, key="crop_left")
-            crop_top = st.slider("Top", 0, height, 0, key="crop_top")
-            crop_right = st.slider("Right", crop_left, width, width, key="crop_right")
-            crop_bottom = st.slider("Bottom", crop_top, height, height, key="crop_bottom")
+            crop_left = st.slider("Left", 0, width, 0, key=f"crop_left_{size_key}")
+            crop_top = st.slider("Top", 0, height, 0, key=f"crop_top_{size_key}")
+            crop_right = st.slider("Right", crop_left, width, width, key=f"crop_right_{size_key}")
+            crop_bottom = st.slider("Bottom", crop_top, height, height, key=f"crop_bottom_{size_key}")
             
             if st.button("Apply Crop"):
-                cropped_image = original_image[crop_top:crop_bottom, crop_left:crop_right]
-                st.session_state.processed_image = cropped_image
-                st.session_state.current_filter = f"Crop ({crop_left},{crop_top},{crop_right},{crop_bottom})"
+                run_filter(
+                    'crop',
+                    f"Crop ({crop_left},{crop_top},{crop_right},{crop_bottom})",
+                    left=crop_left, top=crop_top, right=crop_right, bottom=crop_bottom
+                )
             
             st.markdown("---")
             st.write("**Resize Image:**")
-            resize_width = st.number_input("Width", min_value=1, max_value=2000, value=width, key="resize_width")
-            resize_height = st.number_input("Height", min_value=1, max_value=2000, value=height, key="resize_height")
+            resize_width = st.number_input("Width", min_value=1, max_value=max(2000, width), value=width,
+                                           key=f"resize_width_{size_key}")
+            resize_height = st.number_input("Height", min_value=1, max_value=max(2000, height), value=height,
+                                            key=f"resize_height_{size_key}")
             
             if st.button("Apply Resize"):
-                resized_image = ImageFilters.apply_resize(original_image, width=resize_width, height=resize_height)
-                st.session_state.processed_image = resized_image
-                st.session_state.current_filter = f"Resize ({resize_width}x{resize_height})"
+                run_filter(
+                    'resize',
+                    f"Resize ({resize_width}x{resize_height})",
+                    width=resize_width, height=resize_height
+                )
         
+        filter_stack_panel()
         if st.button("🔄 Reset to Original"):
-            st.session_state.processed_image = original_image.copy()
-            st.session_state.current_filter = "Original"
+            st.session_state.pipeline.clear()
+            render_processed_image()
         if st.session_state.current_filter:
             st.info(f"Current Filter: {st.session_state.current_filter}")
 
+def download_options():
+    """Controls for the download format and encoder settings."""
+    with st.expander("⚙️ Download Options"):
+        export_format = st.selectbox("Format", list(config.EXPORT_FORMATS), key="export_format")
+        defaults = config.EXPORT_FORMATS[export_format]['defaults']
+        if export_format == 'PNG':
+            options = {'compress_level': st.slider(
+                "PNG Compression Level", 0, 9, defaults['compress_level'],
+                help="Lower levels encode faster but produce larger files"
+            )}
+        elif export_format == 'WEBP' and st.checkbox("Lossless", value=defaults['lossless']):
+            options = {'lossless': True}
+        else:
+            options = {'quality': st.slider("Quality", 1, 100, defaults['quality'])}
+    return export_format, options
+
 def download_processed_image():
     if st.session_state.processed_image is not None:
-        pil_image = Image.fromarray(st.session_state.processed_image)
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format='PNG')
-        buffer.seek(0)
+        if st.session_state.get('processed_scale', 1.0) != 1.0 and st.session_state.full_render is None \
+                and len(st.session_state.pipeline) and not render_pending('full'):
+            st.caption("Preview shown at reduced resolution.")
+            if not st.button("🖼️ Render Full Resolution"):
+                return
+        rendered = request_full_resolution()
+        if rendered is None:
+            job = st.session_state.get('full_job')
+            if job is not None:
+                st.progress(job.progress, text="⏳ Rendering full resolution...")
+            return
+        export_format, options = download_options()
+        image, image_key = rendered
+        # Encoded bytes are cached per (image, format, options); reruns that
+        # did not change the result skip the encode entirely
+        data = get_encode_cache().encode(image_key, image, export_format, **options)
         
         # Handle case when current_filter is None
         filter_name = st.session_state.current_filter or "original"
@@ -435,18 +744,39 @@ def download_processed_image():
         
         st.download_button(
             label="💾 Download Processed Image",
-            data=buffer.getvalue(),
-            file_name=f"filtered_image_{safe_filter_name}.png",
-            mime="image/png"
+            data=data,
+            file_name=f"filtered_image_{safe_filter_name}.{config.EXPORT_FORMATS[export_format]['extension']}",
+            mime=config.EXPORT_FORMATS[export_format]['mime']
         )
 
+def run_profiled(func):
+    """Run ``func`` under cProfile and dump the stats for this rerun to PROFILE_DIR."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(func)
+    finally:
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        file_name = f"rerun_{time.strftime('%Y%m%d_%H%M%S')}_{id(profiler):x}.prof"
+        profiler.dump_stats(os.path.join(config.PROFILE_DIR, file_name))
+
 # --- Streamlit App Entry Point ---
+if config.WARMUP_ON_START:
+    start_warm_up()
 if 'logged_in' not in st.session_state:
     st.session_state['logged_in'] = False
 if not st.session_state['logged_in']:
     login_page()
 else:
-    main()
+    with METRICS.span('rerun'):
+        if config.PROFILE_RERUNS:
+            run_profiled(main)
+        else:
+            main()
+    if 'session_id' in st.session_state:
+        track_session_memory()
+    admin_panel()
+    if config.METRICS_LOG_INTERVAL:
+        METRICS.maybe_log(config.METRICS_LOG_INTERVAL)
     st.markdown("---")
     st.markdown("""
     <div style='text-align: center; color: #666;'>
@@ -454,3 +784,4 @@ else:
         <p>Built with Streamlit, OpenCV, and Python</p>
     </div>
     """, unsafe_allow_html=True)
+    poll_pending_jobs()
@@ -0,0 +1,302 @@
+"""Headless batch processing: apply a filter recipe to many images.
+
+Example:
+    python batch.py "photos/**/*.jpg" out/ --recipe "blur:kernel_size=9;sepia" --workers 8
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+import config
+from utils.batch_kernels import apply_recipe_batch
+from utils.image_io import decode_image, encode_image, read_size
+from utils.parallel import init_pool_worker
+from utils.recipes import apply_recipe, parse_recipe
+
+OUTPUT_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'bmp': 'BMP', 'tiff': 'TIFF'}
+MANIFEST_NAME = '.recipe.json'
+
+
+def plan_decode(steps, size):
+    """Fold a leading crop and/or downscaling resize into the decode itself.
+
+    Returns ``(region, target_size, remaining_steps)``; a scale-based resize is
+    rewritten to explicit dimensions because the decoder already shrinks the
+    image towards them.
+    """
+    steps = list(steps)
+    region = target_size = None
+    width, height = size
+    if steps and steps[0][0] == 'crop':
+        params = steps.pop(0)[1]
+        region = (params['left'], params['top'], params['right'], params['bottom'])
+        width = min(params['right'], width) - max(params['left'], 0)
+        height = min(params['bottom'], height) - max(params['top'], 0)
+    if steps and steps[0][0] == 'resize':
+        params = steps[0][1]
+        if params.get('scale') is not None:
+            if params['scale'] < 1:
+                target_size = (max(1, round(width * params['scale'])), max(1, round(height * params['scale'])))
+                steps[0] = ('resize', {'width': target_size[0], 'height': target_size[1]})
+        elif params['width'] < width and params['height'] < height:
+            target_size = (params['width'], params['height'])
+    return region, target_size, steps
+
+
+def process_bytes(data, steps, output_format, max_pixels=None):
+    """Decode encoded image bytes, apply the recipe and return the encoded result.
+
+    Images are processed at full resolution unless ``max_pixels`` caps it.
+    """
+    region, target_size, steps = plan_decode(steps, read_size(data))
+    image = decode_image(data, max_pixels=max_pixels, target_size=target_size, region=region)
+    result = apply_recipe(image, steps)
+    return encode_image(result, OUTPUT_FORMATS[output_format])
+
+
+def process_file(input_path, output_path, steps, output_format, max_pixels=None):
+    """Worker: decode, filter and encode one image. Returns (bytes read, bytes written)."""
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    encoded = process_bytes(data, steps, output_format, max_pixels)
+    write_output(output_path, encoded)
+    return len(data), len(encoded)
+
+
+def write_output(output_path, encoded):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_path = output_path + '.part'
+    with open(temp_path, 'wb') as f:
+        f.write(encoded)
+    os.replace(temp_path, output_path)
+
+
+def process_group(jobs, steps, output_format, max_pixels=None):
+    """Worker: filter same-sized images as one stack with the batch kernels.
+
+    Returns one ``(bytes read, bytes written)`` pair or exception per job. If
+    the stack cannot be built or filtered, every image is retried on its own
+    so a bad file only fails itself.
+    """
+    try:
+        datas = []
+        for input_path, _ in jobs:
+            with open(input_path, 'rb') as f:
+                datas.append(f.read())
+        region, target_size, remaining = plan_decode(steps, read_size(datas[0]))
+        images = [decode_image(data, max_pixels=max_pixels, target_size=target_size, region=region) for data in datas]
+        results = apply_recipe_batch(images, remaining)
+        encoded = [encode_image(result, OUTPUT_FORMATS[output_format]) for result in results]
+    except Exception:
+        return [_try(process_file, input_path, output_path, steps, output_format, max_pixels)
+                for input_path, output_path in jobs]
+    for (_, output_path), data in zip(jobs, encoded):
+        write_output(output_path, data)
+    return [(len(data), len(output)) for data, output in zip(datas, encoded)]
+
+
+def _try(function, *args):
+    try:
+        return function(*args)
+    except Exception as e:
+        return e
+
+
+def stack_key(input_path):
+    """Images with equal keys decode to equally shaped arrays; None if the image should run alone."""
+    try:
+        with Image.open(input_path) as image:
+            size, mode = image.size, image.mode
+    except Exception:
+        return None
+    if mode not in ('RGB', 'L') or size[0] * size[1] > config.BATCH_STACK_MAX_PIXELS:
+        return None
+    return size, mode
+
+
+def group_jobs(jobs, stack_size):
+    """Split ``(input, output)`` jobs into units: groups of small same-sized images, and single jobs."""
+    if stack_size < 2:
+        return [[job] for job in jobs]
+    groups, units = {}, []
+    for job in jobs:
+        key = stack_key(job[0])
+        if key is None:
+            units.append([job])
+            continue
+        group = groups.setdefault(key, [])
+        group.append(job)
+        if len(group) == stack_size:
+            units.append(groups.pop(key))
+    units += groups.values()
+    return units
+
+
+def find_inputs(pattern):
+    """Return the sorted image files matched by ``pattern`` that have a supported extension."""
+    paths = []
+    for path in glob.glob(pattern, recursive=True):
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        if os.path.isfile(path) and extension in config.SUPPORTED_FORMATS:
+            paths.append(path)
+    return sorted(paths)
+
+
+def output_path_for(input_path, input_root, output_dir, output_format):
+    relative = os.path.relpath(input_path, input_root)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + '.' + output_format)
+
+
+def recipe_settings(steps, output_format, max_pixels=None):
+    recipe = {'steps': steps, 'format': output_format}
+    if max_pixels:
+        recipe['max_pixels'] = max_pixels
+    return recipe
+
+
+def recipe_digest(recipe):
+    return hashlib.sha256(json.dumps(recipe, sort_keys=True).encode()).hexdigest()
+
+
+def recipe_changed(output_dir, steps, output_format, max_pixels=None):
+    """Report whether the recipe differs from the one the outputs were last completed with."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            previous = json.load(f).get('digest')
+    except (OSError, ValueError):
+        previous = None
+    return previous != recipe_digest(recipe_settings(steps, output_format, max_pixels))
+
+
+def write_manifest(output_dir, steps, output_format, max_pixels=None):
+    """Record that every output in ``output_dir`` was produced by this recipe."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    recipe = recipe_settings(steps, output_format, max_pixels)
+    with open(manifest_path + '.part', 'w') as f:
+        json.dump({'digest': recipe_digest(recipe), 'recipe': recipe}, f, indent=4)
+    os.replace(manifest_path + '.part', manifest_path)
+
+
+def is_up_to_date(input_path, output_path):
+    try:
+        return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+
+def load_recipe_argument(value):
+    """``--recipe`` accepts either a path to a recipe file or the recipe text itself."""
+    if os.path.isfile(value):
+        with open(value) as f:
+            return parse_recipe(f.read())
+    return parse_recipe(value)
+
+
+def run_batch(inputs, input_root, output_dir, steps, output_format, workers, queue_size, force=False,
+              max_pixels=None):
+    """Process ``inputs`` on a process pool with at most ``queue_size`` images in flight.
+
+    Small images that share a size are filtered in stacks of up to
+    BATCH_STACK_SIZE with the batch kernels. The recipe manifest is only written once every image succeeded, so an
+    interrupted or failed run under a new recipe is redone in full next time.
+    """
+    stale = recipe_changed(output_dir, steps, output_format, max_pixels) or force
+    jobs = []
+    skipped = 0
+    for input_path in inputs:
+        output_path = output_path_for(input_path, input_root, output_dir, output_format)
+        if not stale and is_up_to_date(input_path, output_path):
+            skipped += 1
+        else:
+            jobs.append((input_path, output_path))
+
+    stats = {'processed': 0, 'skipped': skipped, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_pool_worker) as executor:
+        pending = {}
+        in_flight = 0
+        unit_iter = iter(group_jobs(jobs, config.BATCH_STACK_SIZE))
+        while True:
+            # Keep the queue bounded so decoded images never pile up in memory
+            while in_flight < queue_size:
+                unit = next(unit_iter, None)
+                if unit is None:
+                    break
+                if len(unit) == 1:
+                    future = executor.submit(process_file, *unit[0], steps, output_format, max_pixels)
+                else:
+                    future = executor.submit(process_group, unit, steps, output_format, max_pixels)
+                pending[future] = unit
+                in_flight += len(unit)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = pending.pop(future)
+                in_flight -= len(unit)
+                try:
+                    outcomes = future.result() if len(unit) > 1 else [future.result()]
+                except Exception as e:
+                    outcomes = [e] * len(unit)
+                for (input_path, _), outcome in zip(unit, outcomes):
+                    if isinstance(outcome, Exception):
+                        stats['failed'] += 1
+                        print(f"Failed: {input_path}: {outcome}", file=sys.stderr)
+                    else:
+                        stats['processed'] += 1
+                        stats['bytes_in'] += outcome[0]
+                        stats['bytes_out'] += outcome[1]
+    stats['seconds'] = time.perf_counter() - start
+    if not stats['failed']:
+        write_manifest(output_dir, steps, output_format, max_pixels)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an Image Filter App recipe to a batch of images.")
+    parser.add_argument('inputs', help="Input glob, e.g. 'photos/**/*.jpg' (quote it)")
+    parser.add_argument('output_dir', help="Directory for processed images")
+    parser.add_argument('--recipe', required=True,
+                        help="Recipe file or text, e.g. 'blur:kernel_size=9;sepia' or a JSON step list")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help="Maximum images in flight (default: 2 per worker)")
+    parser.add_argument('--format', choices=sorted(OUTPUT_FORMATS), default='png', help="Output format")
+    parser.add_argument('--force', action='store_true', help="Reprocess images even if outputs are up to date")
+    parser.add_argument('--max-pixels', type=int, default=0,
+                        help="Downscale larger inputs to this many pixels before filtering (default: full resolution)")
+    args = parser.parse_args(argv)
+
+    try:
+        steps = load_recipe_argument(args.recipe)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid --recipe: {e}")
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print(f"No supported images match {args.inputs!r}", file=sys.stderr)
+        return 1
+    input_root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs])
+    queue_size = args.queue_size or 2 * args.workers
+
+    stats = run_batch(inputs, input_root, args.output_dir, steps, args.format,
+                      args.workers, queue_size, force=args.force, max_pixels=args.max_pixels or None)
+
+    seconds = max(stats['seconds'], 1e-9)
+    print(f"Processed {stats['processed']} images, skipped {stats['skipped']} up to date, "
+          f"{stats['failed']} failed in {stats['seconds']:.2f}s")
+    print(f"Throughput: {stats['processed'] / seconds:.2f} images/s, "
+          f"{stats['bytes_in'] / seconds / 1e6:.2f} MB/s read, "
+          f"{stats['bytes_out'] / seconds / 1e6:.2f} MB/s written")
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
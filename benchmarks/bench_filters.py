@@ -0,0 +1,219 @@
+"""Benchmark every app filter over a matrix of synthetic images.
+
+Each case runs in a fresh process. Memory is measured for a single filter
+call after the input image exists: on Linux the RSS high-water mark is reset
+first (``peak_rss_mb``, and ``rss_growth_mb`` above the RSS at the reset);
+``traced_peak_mb`` is the tracemalloc peak of Python-visible allocations.
+Results are written as JSON and can be compared against a stored baseline,
+which flags slower cases, higher memory use and cases that started failing:
+
+    python -m benchmarks.bench_filters --sizes 0.3 2 --output bench.json
+    python -m benchmarks.bench_filters --baseline benchmarks/baseline.json --threshold 0.25 --memory-threshold 0.25
+    python -m benchmarks.bench_filters --update-baseline
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from utils.recipes import FILTERS, apply_step
+
+# Parameters used for filters that take any (mirrors the sidebar defaults)
+BENCH_PARAMS = {
+    'blur': {'kernel_size': 15},
+    'brightness_contrast': {'brightness': 20, 'contrast': 20},
+    'color_balance': {'red': 10, 'green': -10, 'blue': 5},
+    'rotate': {'angle': 30},
+    'mirror': {'direction': 'horizontal'},
+    'resize': {'scale': 0.5},
+    'noise': {'noise_type': 'gaussian', 'intensity': 0.1},
+}
+
+SIZES_MP = (0.3, 2, 12, 50)
+MODES = ('rgb', 'gray', 'rgba')
+DTYPES = ('uint8', 'uint16')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Memory differences below this are noise, whatever the ratio
+MEMORY_FLOOR_MB = 1.0
+
+
+def synthetic_image(megapixels, mode, dtype, seed=0):
+    """Deterministic test image: smooth gradients plus noise, so filters see realistic texture."""
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    channels = {'rgb': 3, 'gray': 1, 'rgba': 4}[mode]
+    rng = np.random.default_rng(seed)
+    ramp = np.add.outer(np.linspace(0, 0.6, height, dtype=np.float32), np.linspace(0, 0.4, width, dtype=np.float32))
+    image = np.repeat(ramp[:, :, None], channels, axis=2)
+    image += rng.random((height, width, channels), dtype=np.float32) * 0.3
+    image *= np.iinfo(dtype).max / 1.3
+    image = image.astype(dtype)
+    return image[:, :, 0] if channels == 1 else image
+
+
+def case_params(name, image):
+    if name == 'crop':
+        height, width = image.shape[:2]
+        return {'left': width // 4, 'top': height // 4, 'right': 3 * width // 4, 'bottom': 3 * height // 4}
+    return BENCH_PARAMS.get(name, {})
+
+
+def _proc_status_mb(*fields):
+    with open('/proc/self/status') as f:
+        values = dict(line.split(':', 1) for line in f)
+    return [int(values[field].split()[0]) / 1024 for field in fields]
+
+
+def reset_peak_rss():
+    """Reset the RSS high-water mark to the current RSS; returns that RSS in MB, or None if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        rss, = _proc_status_mb('VmRSS')
+    except (OSError, KeyError, ValueError):
+        return None
+    return rss
+
+
+def peak_rss():
+    hwm, = _proc_status_mb('VmHWM')
+    return hwm
+
+
+def run_case(case):
+    """Worker: time one filter on one synthetic image and report the memory of one call."""
+    name, megapixels, mode, dtype, repeats = case
+    image = synthetic_image(megapixels, mode, dtype)
+    params = case_params(name, image)
+    result = {'filter': name, 'megapixels': megapixels, 'mode': mode, 'dtype': dtype}
+    try:
+        apply_step(image, name, params)  # warm-up (imports, kernel caches)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            apply_step(image, name, params)
+            timings.append(time.perf_counter() - start)
+        rss_before = reset_peak_rss()
+        apply_step(image, name, params)
+        rss_peak = peak_rss() if rss_before is not None else None
+        tracemalloc.start()
+        apply_step(image, name, params)
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    except Exception as e:
+        result.update(status='error', error=f"{type(e).__name__}: {e}")
+        return result
+    result.update(
+        status='ok',
+        seconds_min=min(timings),
+        seconds_median=statistics.median(timings),
+        traced_peak_mb=traced_peak / 1e6,
+    )
+    if rss_peak is not None:
+        result.update(peak_rss_mb=rss_peak, rss_growth_mb=rss_peak - rss_before)
+    return result
+
+
+def case_key(result):
+    return f"{result['filter']}|{result['megapixels']}|{result['mode']}|{result['dtype']}"
+
+
+def compare(results, baseline, threshold, memory_threshold=None):
+    """Return descriptions of cases that regressed against the baseline.
+
+    A case regresses when it fails where the baseline succeeded, gets slower
+    by more than ``threshold``, or uses more memory (traced or RSS growth) by
+    more than ``memory_threshold`` (defaults to ``threshold``).
+    """
+    if memory_threshold is None:
+        memory_threshold = threshold
+    previous = {case_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if not before or before.get('status') != 'ok':
+            continue
+        if result['status'] != 'ok':
+            regressions.append(f"{case_key(result)}: ok -> {result['status']} ({result.get('error', '')})")
+            continue
+        ratio = result['seconds_min'] / max(before['seconds_min'], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{case_key(result)}: {before['seconds_min'] * 1000:.1f}ms -> "
+                f"{result['seconds_min'] * 1000:.1f}ms ({ratio:.2f}x)"
+            )
+        for field in ('traced_peak_mb', 'rss_growth_mb'):
+            if before.get(field) is None or result.get(field) is None:
+                continue
+            limit = max(before[field] * (1 + memory_threshold), before[field] + MEMORY_FLOOR_MB)
+            if result[field] > limit:
+                regressions.append(
+                    f"{case_key(result)}: {field} {before[field]:.1f}MB -> {result[field]:.1f}MB"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Image Filter App filters.")
+    parser.add_argument('--filters', nargs='+', default=sorted(FILTERS), choices=sorted(FILTERS))
+    parser.add_argument('--sizes', nargs='+', type=float, default=list(SIZES_MP), help="Image sizes in megapixels")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--dtypes', nargs='+', default=list(DTYPES), choices=DTYPES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default='bench_output.json', help="Where to write this run's results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--memory-threshold', type=float, default=None,
+                        help="Allowed memory growth (default: same as --threshold)")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    cases = [
+        (name, size, mode, dtype, args.repeats)
+        for name in args.filters for size in args.sizes for mode in args.modes for dtype in args.dtypes
+    ]
+    # One process per case keeps peak RSS attributable to a single filter
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for result in pool.imap(run_case, cases):
+            results.append(result)
+            if result['status'] == 'ok':
+                rss = f"{result['rss_growth_mb']:8.1f} MB RSS" if 'rss_growth_mb' in result else ' ' * 15
+                print(f"{case_key(result):45s} {result['seconds_min'] * 1000:9.1f} ms "
+                      f"{rss} {result['traced_peak_mb']:8.1f} MB traced")
+            else:
+                print(f"{case_key(result):45s} {result['error']}")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold, args.memory_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Report cold-start import times for the app's entry points.
+
+Each entry point is imported in a fresh interpreter under ``python -X
+importtime``, so numbers include everything it pulls in. The login entry
+imports app.py itself (with streamlit stubbed out) and fails if that loads
+the image stack; a baseline comparison catches slow-downs:
+
+    python -m benchmarks.import_report
+    python -m benchmarks.import_report --update-baseline
+    python -m benchmarks.import_report --threshold 0.5 --top 15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Stand-in for streamlit so ``import app`` renders the logged-out page without
+# a server: widgets return falsy values, layout helpers are context managers
+STREAMLIT_STUB = """
+import sys, types
+
+class _Widget:
+    def __call__(self, *args, **kwargs):
+        return _Widget()
+    def __getattr__(self, name):
+        return _Widget()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def __bool__(self):
+        return False
+
+class _SessionState(dict):
+    __getattr__ = dict.get
+    def __setattr__(self, name, value):
+        self[name] = value
+
+_st = types.ModuleType('streamlit')
+_st.session_state = _SessionState()
+_st.cache_resource = lambda func=None, **kwargs: func if func else (lambda f: f)
+_st.columns = lambda spec, **kwargs: [_Widget() for _ in range(spec if isinstance(spec, int) else len(spec))]
+_st.__getattr__ = lambda name: _Widget()
+sys.modules['streamlit'] = _st
+"""
+
+# What each entry point imports before it can serve its first request, and
+# code run first. 'login' imports app.py itself with no one logged in, so any
+# new eager import in app.py shows up
+ENTRY_POINTS = {
+    'login': (['app'], STREAMLIT_STUB),
+    'editor': (['utils.pipeline', 'utils.image_io', 'utils.preview', 'utils.buffers', 'utils.cache'], ''),
+    'batch': (['batch'], ''),
+    'server': (['server'], ''),
+}
+
+# Modules the login path must not load (they belong behind lazy_import)
+LOGIN_FORBIDDEN = (
+    'cv2', 'numpy', 'PIL', 'utils.filters', 'utils.pipeline', 'utils.image_io', 'skimage', 'matplotlib', 'requests'
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'import_baseline.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(modules, prelude=''):
+    """Import ``modules`` in a fresh interpreter after running ``prelude``.
+
+    Returns ``(timings, loaded)``: ``{module: (self_us, cumulative_us, top_level)}``
+    from ``-X importtime`` and the names the imports added to ``sys.modules``.
+    """
+    code = prelude + (
+        "\nimport json, sys\n_before = set(sys.modules)\n"
+        + ''.join(f"import {module}\n" for module in modules)
+        + "print(json.dumps(sorted(set(sys.modules) - _before)))\n"
+    )
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    timings = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Top-level imports have no indentation in the package column
+        timings[name.strip()] = (int(self_us), int(cumulative_us), not name[1:].startswith(' '))
+    loaded = json.loads(process.stdout.strip().splitlines()[-1])
+    return {name: timing for name, timing in timings.items() if name in loaded}, loaded
+
+
+def run_entry(name, modules, prelude=''):
+    result = {'entry': name}
+    try:
+        timings, loaded = measure(modules, prelude)
+    except RuntimeError as e:
+        result.update(status='error', error=str(e))
+        return result
+    total_us = sum(cumulative for _, cumulative, top_level in timings.values() if top_level)
+    result.update(
+        status='ok',
+        total_ms=total_us / 1000,
+        modules=len(loaded),
+        slowest=sorted(
+            ({'module': module, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative / 1000}
+             for module, (self_us, cumulative, _) in timings.items()),
+            key=lambda row: row['self_ms'], reverse=True
+        ),
+        loaded=loaded,
+    )
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Return descriptions of entry points whose import time grew by more than ``threshold``."""
+    previous = {result['entry']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['entry'])
+        if result['status'] != 'ok' or not before or before.get('status') != 'ok':
+            continue
+        ratio = result['total_ms'] / max(before['total_ms'], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{result['entry']}: {before['total_ms']:.0f}ms -> {result['total_ms']:.0f}ms ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import times of Image Filter App entry points.")
+    parser.add_argument('--entries', nargs='+', default=list(ENTRY_POINTS), choices=list(ENTRY_POINTS))
+    parser.add_argument('--top', type=int, default=10, help="Slowest modules to list per entry point")
+    parser.add_argument('--output', default='import_report.json', help="Where to write this run's results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.5, help="Allowed slowdown, 0.5 = 50%%")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    problems = []
+    for name in args.entries:
+        result = run_entry(name, *ENTRY_POINTS[name])
+        results.append(result)
+        if result['status'] != 'ok':
+            print(f"{name:8s} failed: {result['error']}")
+            continue
+        print(f"{name:8s} {result['total_ms']:8.1f} ms, {result['modules']} modules")
+        for row in result['slowest'][:args.top]:
+            print(f"    {row['module']:40s} {row['self_ms']:8.1f} ms self {row['cumulative_ms']:8.1f} ms cumulative")
+        if name == 'login':
+            problems += [f"login imports {module}" for module in LOGIN_FORBIDDEN if module in result['loaded']]
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': [{key: value for key, value in result.items() if key != 'loaded'} for result in results],
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            problems += compare(results, json.load(f), args.threshold)
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Load-test a running server.py instance.
+
+Sends a synthetic image to /process (or batches of it to /batch) from
+concurrent client threads and reports throughput, latency percentiles and
+how many requests were refused with 429:
+
+    python server.py --port 8080 &
+    python -m benchmarks.load_test --url http://127.0.0.1:8080 --concurrency 16 --requests 400
+"""
+import argparse
+import http.client
+import io
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+from PIL import Image
+
+
+def synthetic_png(megapixels):
+    side = int((megapixels * 1e6) ** 0.5)
+    image = np.random.default_rng(0).integers(0, 256, size=(side, side, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def multipart_body(data, count):
+    boundary = uuid.uuid4().hex
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="image{index}.png"\r\n'
+        f'Content-Type: image/png\r\n\r\n'.encode() + data + b'\r\n'
+        for index in range(count)
+    ]
+    return b''.join(parts) + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+def client(url, path, body, content_type, count, results, lock):
+    """Send requests until ``count`` is used up; one keep-alive connection per thread."""
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=300)
+    while True:
+        with lock:
+            if count[0] <= 0:
+                break
+            count[0] -= 1
+        start = time.perf_counter()
+        try:
+            connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port, timeout=300)
+        with lock:
+            results.append((status, time.perf_counter() - start))
+    connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Image Filter App HTTP API.")
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help="Server base URL")
+    parser.add_argument('--recipe', default='blur:kernel_size=9;sepia', help="Recipe sent with every request")
+    parser.add_argument('--format', default='jpg', help="Output format")
+    parser.add_argument('--megapixels', type=float, default=1.0, help="Size of the synthetic test image")
+    parser.add_argument('--concurrency', type=int, default=8, help="Client threads")
+    parser.add_argument('--requests', type=int, default=200, help="Total requests")
+    parser.add_argument('--batch', type=int, default=0, help="Images per /batch request (0 uses /process)")
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    data = synthetic_png(args.megapixels)
+    query = f"?recipe={quote(args.recipe)}&format={args.format}"
+    if args.batch:
+        body, content_type = multipart_body(data, args.batch)
+        path = '/batch' + query
+    else:
+        body, content_type, path = data, 'image/png', '/process' + query
+
+    results, count, lock = [], [args.requests], threading.Lock()
+    threads = [
+        threading.Thread(target=client, args=(url, path, body, content_type, count, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for status, latency in results if status == 200)
+    images = statuses[200] * (args.batch or 1)
+    print(f"{len(results)} requests in {seconds:.2f}s, statuses: {dict(statuses)}")
+    print(f"Throughput: {statuses[200] / seconds:.2f} requests/s, {images / seconds:.2f} images/s")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        print(f"Latency: p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+    return 0 if statuses[200] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,7 +30,8 @@ DEFAULT_PARAMS = {
     'blue_balance': 0,
     'rotation_angle': 0,
     'scale_factor': 1.0,
-    'noise_intensity': 0.1
+    'noise_intensity': 0.1,
+    'noise_seed': 0
 }
 
 # UI styling
@@ -62,4 +63,106 @@ CSS_STYLES = """
         text-align: center;
         background-color: #f8f9fa;
     }
-""" 
\ No newline at end of file
+""" 
+# Decode cache: decoded uploads shared by all sessions, keyed by content hash.
+# With a directory set, decoded images are written there and memory-mapped,
+# so originals live in the page cache instead of each process's heap
+DECODE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DECODE_MMAP_DIR = ''
+DECODE_MMAP_MAX_BYTES = 8 * 1024 * 1024 * 1024
+
+# Preview proxy: interactive filters run on a downscaled pyramid level that
+# matches the display column; full resolution is rendered only for download
+PREVIEW_ENABLED = True
+PREVIEW_DISPLAY_WIDTH = 700
+
+# Pipeline stage cache: intermediate filter results keyed by (input, step, params)
+STAGE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Tiled processing: images whose filter working set would exceed the budget
+# are processed in overlapping tiles. The working factor estimates bytes of
+# intermediates per byte of image (float conversions, temporaries)
+TILE_MEMORY_BUDGET = 256 * 1024 * 1024
+TILE_WORKING_FACTOR = 8
+
+# Multi-core band scheduler: worker threads for single-image filters
+# (0 means one per CPU); smaller images are filtered serially
+PARALLEL_WORKERS = 0
+PARALLEL_MIN_PIXELS = 2_000_000
+
+# Download formats and their default encoder settings
+EXPORT_FORMATS = {
+    'PNG': {'extension': 'png', 'mime': 'image/png', 'defaults': {'compress_level': 6}},
+    'JPEG': {'extension': 'jpg', 'mime': 'image/jpeg', 'defaults': {'quality': 90}},
+    'WEBP': {'extension': 'webp', 'mime': 'image/webp', 'defaults': {'quality': 90, 'lossless': False}},
+}
+
+# Encoded download bytes keyed by (result, format, options)
+ENCODE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Display previews: images sent to the browser are downscaled and encoded
+# once per change instead of shipping full-resolution arrays every rerun
+PREVIEW_IMAGE_WIDTH = 1000
+PREVIEW_IMAGE_FORMAT = 'JPEG'
+PREVIEW_IMAGE_QUALITY = 85
+PREVIEW_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# User accounts: backend name, database file and the legacy JSON file that is
+# imported once on first start
+USER_STORE_BACKEND = 'sqlite'
+USER_DB_PATH = 'users.db'
+LEGACY_USERS_JSON = 'users.json'
+
+# Instrumentation: users who see the performance panel, how often a latency
+# summary is logged (seconds, 0 disables) and optional per-rerun cProfile dumps
+ADMIN_USERS = ['admin']
+METRICS_LOG_INTERVAL = 60
+PROFILE_RERUNS = False
+PROFILE_DIR = 'profiles'
+
+# Background render jobs: shared worker threads, the most jobs that may be in
+# flight across all sessions, and how often a waiting page re-checks (seconds)
+JOB_WORKERS = 4
+JOB_MAX_PENDING = 32
+JOB_POLL_INTERVAL = 0.5
+
+# Disk tier of the stage cache, shared by every process on the host. Results
+# are stored as memory-mapped .npy files, or compressed .npz files when
+# COMPRESS is set (smaller, but loaded fully on a hit). 0 disables the tier
+RESULT_DISK_CACHE_DIR = '.cache/results'
+RESULT_DISK_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+RESULT_DISK_CACHE_COMPRESS = False
+
+# Largest working resolution in pixels; bigger uploads are decoded at reduced
+# resolution (JPEG draft mode) and downscaled to this size
+MAX_WORKING_PIXELS = 40_000_000
+
+# Memoised auxiliary data for parameterised steps (seeded noise fields),
+# keyed by image shape and parameters
+DERIVED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Session buffers: memory one session may pin in process memory (0 disables
+# the check), and how many times larger than a view its buffer may be before
+# a cached crop is copied instead of kept as a view
+SESSION_MEMORY_BUDGET = 1024 * 1024 * 1024
+VIEW_MAX_WASTE = 4
+
+# HTTP API (server.py): listen address, worker processes (0 means one per
+# CPU), images that may be queued or running before requests get 429, and the
+# largest accepted request body
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+SERVER_WORKERS = 0
+SERVER_MAX_PENDING = 64
+SERVER_MAX_BODY_BYTES = 100 * 1024 * 1024
+
+# Batch CLI: inputs of at most BATCH_STACK_MAX_PIXELS that share a size are
+# filtered together in stacks of up to BATCH_STACK_SIZE images (below 2 disables)
+BATCH_STACK_SIZE = 16
+BATCH_STACK_MAX_PIXELS = 1_000_000
+
+# Cold start: the image stack is imported on first use. With warm-up enabled,
+# the first script run of a server process (the first page view; Streamlit's
+# health endpoint does not run the script) starts loading it and running each
+# filter once on a background thread
+WARMUP_ON_START = False
@@ -0,0 +1,383 @@
+"""HTTP API for running filter recipes outside the Streamlit UI.
+
+Example:
+    python server.py --port 8080 --workers 4
+    curl --data-binary @photo.jpg -o out.png 'http://localhost:8080/process?recipe=blur:kernel_size=9;sepia'
+
+Endpoints:
+    POST /process   one image as the raw body (or a single-file multipart form);
+                    responds with the filtered image
+    POST /batch     multipart form with any number of files; responds with a
+                    chunked multipart/mixed stream, one part per image in
+                    completion order
+    GET  /filters   available filter names
+    GET  /health    queue status; 503 while the worker pool is broken
+    GET  /metrics   Prometheus text export
+
+``recipe`` (same syntax as batch.py) and ``format`` are query parameters; a
+multipart ``recipe`` field overrides the query. Images run on a pool of warm
+worker processes; when more than SERVER_MAX_PENDING images are queued the
+request is refused with 429.
+"""
+import argparse
+import json
+import logging
+import mimetypes
+import multiprocessing
+import os
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from email import policy
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import config
+from batch import OUTPUT_FORMATS, process_bytes
+from utils.jobs import QueueFull
+from utils.metrics import METRICS
+from utils.recipes import FILTERS, parse_recipe
+
+logger = logging.getLogger(__name__)
+
+
+def warm_worker():
+    """Import the filters and run a tiny recipe so the first request does not pay for it."""
+    import numpy as np
+    from utils.parallel import init_pool_worker
+    from utils.recipes import apply_recipe
+    init_pool_worker()
+    apply_recipe(np.zeros((8, 8, 3), dtype=np.uint8), [('grayscale', {})])
+
+
+class ServiceUnavailable(Exception):
+    """Raised when the worker pool died; it has been replaced and the request may be retried."""
+
+
+class FilterService:
+    """Warm process pool with a bound on the number of images queued or running."""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=warm_worker
+        )
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first requests."""
+        for future in [self._executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, items, steps, output_format):
+        """Queue ``(name, data)`` items; returns ``{future: name}``.
+
+        Raises QueueFull when the items do not fit, and ServiceUnavailable
+        when the pool turned out to be broken (it is replaced first).
+        """
+        with self._lock:
+            if self.pending + len(items) > self.max_pending:
+                raise QueueFull()
+            self.pending += len(items)
+            executor = self._executor
+        futures = {}
+        try:
+            for name, data in items:
+                # Requests are capped like uploads in the app to bound worker memory
+                future = executor.submit(process_bytes, data, steps, output_format, config.MAX_WORKING_PIXELS)
+                future.add_done_callback(self._release)
+                futures[future] = name
+        except BrokenProcessPool:
+            for future in futures:
+                future.cancel()
+            self.replace_broken(executor)
+            raise ServiceUnavailable()
+        finally:
+            # Submitted futures give their slot back when they finish
+            with self._lock:
+                self.pending -= len(items) - len(futures)
+        return futures
+
+    def replace_broken(self, executor=None):
+        """Replace the pool if it is broken (a worker died); returns True if it was."""
+        with self._lock:
+            if executor is not None and executor is not self._executor:
+                return True
+            if not self.broken:
+                return False
+            broken, self._executor = self._executor, self._new_executor()
+            self.restarts += 1
+        logger.warning("worker pool was broken, started a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+        return True
+
+    @property
+    def broken(self):
+        # Set by the executor as soon as a worker process exits unexpectedly
+        return bool(getattr(self._executor, '_broken', False))
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': self.pending,
+                'max_pending': self.max_pending,
+                'workers': self.workers,
+                'broken': self.broken,
+                'restarts': self.restarts,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+def parse_multipart(content_type, body):
+    """Split a multipart/form-data body into ``(fields, files)``; files are ``(filename, bytes)``."""
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+    if not message.is_multipart():
+        raise ValueError("Expected a multipart/form-data body")
+    fields, files = {}, []
+    for part in message.iter_parts():
+        payload = part.get_payload(decode=True) or b''
+        filename = part.get_filename()
+        if filename is not None:
+            files.append((filename, payload))
+        else:
+            fields[part.get_param('name', header='content-disposition')] = payload.decode()
+    return fields, files
+
+
+def output_name(filename, output_format):
+    return os.path.splitext(os.path.basename(filename))[0] + '.' + output_format
+
+
+class RequestError(Exception):
+    """Rejected request: carries the HTTP status and a message for the client."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Metric label per endpoint; anything else is counted as 'other' so arbitrary
+# paths cannot create new series
+ROUTES = {'/process': 'process', '/batch': 'batch', '/health': 'health', '/filters': 'filters', '/metrics': 'metrics'}
+
+
+class FilterRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ImageFilterAPI/1.0'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        with METRICS.span('request', endpoint=ROUTES.get(path, 'other')):
+            if path == '/health':
+                stats = self.service.stats()
+                if stats['broken']:
+                    self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'status': 'broken', **stats})
+                else:
+                    self.send_json(HTTPStatus.OK, {'status': 'ok', **stats})
+            elif path == '/filters':
+                self.send_json(HTTPStatus.OK, {'filters': sorted(FILTERS), 'formats': sorted(OUTPUT_FORMATS)})
+            elif path == '/metrics':
+                self.send_body(HTTPStatus.OK, METRICS.prometheus_text().encode(), 'text/plain; version=0.0.4')
+            else:
+                self.send_json(HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint: {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        handlers = {'/process': self.handle_process, '/batch': self.handle_batch}
+        if url.path not in handlers:
+            self.close_connection = True
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint: {url.path}"})
+            return
+        self.streaming = False
+        with METRICS.span('request', endpoint=ROUTES[url.path]):
+            try:
+                handlers[url.path](parse_qs(url.query))
+            except RequestError as e:
+                self.send_json(e.status, {'error': str(e)})
+            except QueueFull:
+                METRICS.inc('requests_rejected_total', endpoint=ROUTES[url.path])
+                self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {'error': "Server busy, retry later"},
+                               {'Retry-After': '1'})
+            except ServiceUnavailable:
+                self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Worker pool restarted, retry"},
+                               {'Retry-After': '1'})
+            except ConnectionError:
+                # The client went away; nothing left to answer
+                self.close_connection = True
+            except Exception:
+                logger.exception("Error handling %s", self.path)
+                self.close_connection = True
+                # Once a chunked response has started, the status line is gone
+                if not self.streaming:
+                    self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"})
+
+    def read_body(self):
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required")
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > config.SERVER_MAX_BODY_BYTES:
+            self.close_connection = True
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        return self.rfile.read(length)
+
+    def read_request(self, query):
+        """Return ``(steps, output_format, files)`` from the query string and body."""
+        body = self.read_body()
+        content_type = self.headers.get('Content-Type', '')
+        fields, files = {}, []
+        if content_type.startswith('multipart/'):
+            try:
+                fields, files = parse_multipart(content_type, body)
+            except ValueError as e:
+                raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        elif body:
+            files = [(query.get('filename', ['image'])[0], body)]
+        output_format = fields.get('format') or query.get('format', ['png'])[0]
+        if output_format not in OUTPUT_FORMATS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Unsupported format: {output_format}")
+        try:
+            steps = parse_recipe(fields.get('recipe') or query.get('recipe', [''])[0])
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"Invalid recipe: {e}")
+        if not files:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "No image in request")
+        return steps, output_format, files
+
+    def handle_process(self, query):
+        steps, output_format, files = self.read_request(query)
+        if len(files) != 1:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Send exactly one image, or use /batch")
+        future, = self.service.submit(files, steps, output_format)
+        try:
+            encoded = future.result()
+        except BrokenProcessPool:
+            self.service.replace_broken()
+            raise ServiceUnavailable()
+        except Exception as e:
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"Could not process image: {e}")
+        self.send_body(HTTPStatus.OK, encoded, mimetypes.guess_type('x.' + output_format)[0],
+                       {'Content-Disposition': f'inline; filename="{output_name(files[0][0], output_format)}"'})
+
+    def handle_batch(self, query):
+        steps, output_format, files = self.read_request(query)
+        if len(files) > self.service.max_pending:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"At most {self.service.max_pending} images per batch")
+        futures = self.service.submit(files, steps, output_format)
+        boundary = uuid.uuid4().hex
+        self.streaming = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        mime = mimetypes.guess_type('x.' + output_format)[0]
+        # Parts are streamed as soon as each image is done, not in upload order
+        for future in as_completed(futures):
+            filename = output_name(futures[future], output_format)
+            try:
+                payload, headers = future.result(), {'Content-Type': mime, 'X-Status': '200'}
+            except BrokenProcessPool:
+                self.service.replace_broken()
+                payload = json.dumps({'error': "Worker pool restarted, retry"}).encode()
+                headers = {'Content-Type': 'application/json',
+                           'X-Status': str(int(HTTPStatus.SERVICE_UNAVAILABLE))}
+            except Exception as e:
+                payload = json.dumps({'error': f"Could not process image: {e}"}).encode()
+                headers = {'Content-Type': 'application/json', 'X-Status': str(int(HTTPStatus.UNPROCESSABLE_ENTITY))}
+            headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            head = f'--{boundary}\r\n' + ''.join(f'{key}: {value}\r\n' for key, value in headers.items()) + '\r\n'
+            self.write_chunk(head.encode() + payload + b'\r\n')
+        self.write_chunk(f'--{boundary}--\r\n'.encode())
+        self.write_chunk(b'')
+
+    def write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        METRICS.inc('responses_total', status=int(status))
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload).encode(), 'application/json', headers)
+
+
+class FilterServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, FilterRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Image Filter App recipes over HTTP.")
+    parser.add_argument('--host', default=config.SERVER_HOST, help="Address to listen on")
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT, help="Port to listen on")
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS or os.cpu_count() or 1,
+                        help="Worker processes")
+    parser.add_argument('--max-pending', type=int, default=config.SERVER_MAX_PENDING,
+                        help="Images queued or running before requests are refused with 429")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    service = FilterService(args.workers, args.max_pending)
+    METRICS.register_cache('server_queue', service)
+    service.warm_up()
+    server = FilterServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_port} with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Tests import the app's modules (config, utils.*, batch, server) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import parallel, recipes  # noqa: E402
+
+
+def box_blur(image, size=9):
+    return cv2.blur(image, (size, size))
+
+
+@pytest.fixture
+def box_step(monkeypatch):
+    """Register a pure-OpenCV 'box' step (footprint 4, halo 4); call the fixture value to change the halo."""
+    monkeypatch.setattr(parallel, '_halo_verdicts', {})
+    monkeypatch.setitem(recipes.FILTERS, 'box', box_blur)
+
+    def set_halo(halo):
+        monkeypatch.setitem(recipes.TILE_HALO, 'box', halo)
+    set_halo(4)
+    return set_halo
+
+
+@pytest.fixture
+def photo():
+    return np.random.default_rng(1).integers(0, 256, size=(300, 220, 3), dtype=np.uint8)
+
+
+def invert(image):
+    return cv2.bitwise_not(image)
+
+
+def brightness_contrast(image, brightness=0, contrast=0):
+    return cv2.convertScaleAbs(image, alpha=1 + contrast / 100, beta=brightness)
+
+
+def swap_red_blue(image):
+    return np.ascontiguousarray(image[..., ::-1])
+
+
+@pytest.fixture
+def pointwise_steps(monkeypatch, box_step):
+    """Replace the point-wise filters with OpenCV versions so fusion can be probed without ImageFilters."""
+    from utils import lut
+    monkeypatch.setitem(recipes.FILTERS, 'invert', invert)
+    monkeypatch.setitem(recipes.FILTERS, 'brightness_contrast', brightness_contrast)
+    monkeypatch.setitem(recipes.FILTERS, 'sepia', swap_red_blue)
+    lut._describe.cache_clear()
+    yield
+    lut._describe.cache_clear()
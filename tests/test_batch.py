@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import batch
+
+# A leading crop is folded into the decode, so this recipe needs no filters
+CROP = [('crop', {'left': 0, 'top': 0, 'right': 8, 'bottom': 8})]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    source = tmp_path / 'in'
+    source.mkdir()
+    Image.fromarray(np.full((16, 16, 3), 128, dtype=np.uint8)).save(source / 'good.png')
+    return source
+
+
+def run(inputs, output_dir, steps, force=False):
+    paths = batch.find_inputs(str(inputs / '*'))
+    return batch.run_batch(paths, str(inputs), str(output_dir), steps, 'png', workers=1, queue_size=2, force=force)
+
+
+def test_unchanged_recipe_skips_up_to_date_outputs(inputs, tmp_path):
+    assert run(inputs, tmp_path / 'out', [])['processed'] == 1
+    stats = run(inputs, tmp_path / 'out', [])
+    assert (stats['processed'], stats['skipped']) == (0, 1)
+
+
+def test_failed_run_under_new_recipe_is_redone(inputs, tmp_path):
+    out = tmp_path / 'out'
+    run(inputs, out, [])
+    (inputs / 'broken.png').write_bytes(b'not an image')
+    stats = run(inputs, out, CROP)
+    assert (stats['processed'], stats['failed']) == (1, 1)
+    assert batch.recipe_changed(str(out), CROP, 'png')
+    # good.png is newer than its input, but it may be stale for this recipe
+    os.remove(inputs / 'broken.png')
+    stats = run(inputs, out, CROP)
+    assert (stats['processed'], stats['skipped']) == (1, 0)
+    assert not batch.recipe_changed(str(out), CROP, 'png')
+
+
+def test_forced_run_records_the_recipe(inputs, tmp_path):
+    out = tmp_path / 'out'
+    run(inputs, out, [])
+    run(inputs, out, CROP, force=True)
+    assert not batch.recipe_changed(str(out), CROP, 'png')
+    assert run(inputs, out, CROP)['skipped'] == 1
+
+
+@pytest.mark.parametrize('recipe', ['no_such_filter', '[{"name": "sepia"', '[1]'])
+def test_bad_recipe_is_a_usage_error(inputs, tmp_path, recipe, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch.main([str(inputs / '*'), str(tmp_path / 'out'), '--recipe', recipe])
+    assert exit_info.value.code == 2
+    assert 'invalid --recipe' in capsys.readouterr().err
+
+
+def test_batch_keeps_full_resolution_unless_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch.config, 'MAX_WORKING_PIXELS', 100)
+    source = tmp_path / 'in'
+    source.mkdir()
+    Image.fromarray(np.zeros((40, 30, 3), dtype=np.uint8)).save(source / 'big.png')
+    run(source, tmp_path / 'full', [])
+    assert Image.open(tmp_path / 'full' / 'big.png').size == (30, 40)
+    paths = batch.find_inputs(str(source / '*'))
+    batch.run_batch(paths, str(source), str(tmp_path / 'capped'), [], 'png', 1, 2, max_pixels=300)
+    assert Image.open(tmp_path / 'capped' / 'big.png').size == (15, 20)
+    # Changing the cap invalidates earlier outputs
+    assert batch.recipe_changed(str(tmp_path / 'capped'), [], 'png')
+    assert not batch.recipe_changed(str(tmp_path / 'capped'), [], 'png', max_pixels=300)
+
+
+def test_stacked_groups_match_per_image_processing(pointwise_steps, tmp_path, monkeypatch):
+    source = tmp_path / 'in'
+    source.mkdir()
+    rng = np.random.default_rng(3)
+    for index in range(5):
+        Image.fromarray(rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8)).save(source / f'same{index}.png')
+    Image.fromarray(rng.integers(0, 256, size=(30, 20, 3), dtype=np.uint8)).save(source / 'other.png')
+    (source / 'broken.png').write_bytes(b'not an image')
+    steps = [('brightness_contrast', {'brightness': 10, 'contrast': 5}), ('box', {}), ('invert', {})]
+
+    units = batch.group_jobs([(str(path), '') for path in sorted(source.iterdir())], 3)
+    assert sorted(len(unit) for unit in units) == [1, 1, 2, 3]
+
+    monkeypatch.setattr(batch.config, 'BATCH_STACK_SIZE', 3)
+    stacked = run(source, tmp_path / 'stacked', steps)
+    monkeypatch.setattr(batch.config, 'BATCH_STACK_SIZE', 0)
+    single = run(source, tmp_path / 'single', steps)
+    assert stacked['processed'] == single['processed'] == 6
+    assert stacked['failed'] == single['failed'] == 1
+    for path in sorted((tmp_path / 'single').glob('*.png')):
+        assert (tmp_path / 'stacked' / path.name).read_bytes() == path.read_bytes()
+
+
+def test_a_bad_image_in_a_group_fails_alone(pointwise_steps, tmp_path):
+    source = tmp_path / 'in'
+    source.mkdir()
+    for index in range(3):
+        Image.fromarray(np.full((8, 8, 3), index, dtype=np.uint8)).save(source / f'{index}.png')
+    jobs = [(str(source / f'{index}.png'), str(tmp_path / 'out' / f'{index}.png')) for index in range(3)]
+    # Truncated after the header: groups by size, fails to decode
+    data = (source / '1.png').read_bytes()
+    (source / '1.png').write_bytes(data[:40])
+    outcomes = batch.process_group(jobs, [('invert', {})], 'png')
+    assert isinstance(outcomes[1], Exception)
+    assert not isinstance(outcomes[0], Exception) and not isinstance(outcomes[2], Exception)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from utils import batch_kernels, recipes
+from utils.batch_kernels import apply_recipe_batch, apply_step_batch
+
+STEPS = [
+    ('crop', {'left': 10, 'top': 5, 'right': 150, 'bottom': 120}),
+    ('brightness_contrast', {'brightness': -15, 'contrast': 25}),
+    ('sepia', {}),
+    ('box', {}),
+    ('mirror', {'direction': 'vertical'}),
+    ('invert', {}),
+]
+
+
+def mirror(image, direction='horizontal'):
+    return np.ascontiguousarray(image[:, ::-1] if direction == 'horizontal' else image[::-1])
+
+
+@pytest.fixture
+def stack(pointwise_steps, monkeypatch):
+    monkeypatch.setattr(batch_kernels, '_kernel_verdicts', {})
+    monkeypatch.setitem(recipes.FILTERS, 'mirror', mirror)
+    rng = np.random.default_rng(2)
+    return [rng.integers(0, 256, size=(160, 200, 3), dtype=np.uint8) for _ in range(4)]
+
+
+def test_recipe_batch_matches_per_image_recipe(stack):
+    results = apply_recipe_batch(stack, STEPS)
+    assert results.shape == (4, 115, 140, 3)
+    for image, result in zip(stack, results):
+        assert np.array_equal(result, recipes.apply_recipe(image, STEPS))
+
+
+@pytest.mark.parametrize('name, params', STEPS)
+def test_step_batch_matches_per_image_step(stack, name, params):
+    results = apply_step_batch(stack, name, params)
+    for image, result in zip(stack, results):
+        assert np.array_equal(result, recipes.apply_step(image, name, params))
+
+
+def test_mismatched_shapes_are_rejected(stack):
+    with pytest.raises(ValueError):
+        apply_step_batch([stack[0], stack[1][:10]], 'invert')
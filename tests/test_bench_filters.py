@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks import bench_filters
+from benchmarks.bench_filters import case_key, compare
+
+
+def case(status='ok', seconds=0.010, traced=10.0, rss=20.0, **extra):
+    result = {'filter': 'blur', 'megapixels': 2, 'mode': 'rgb', 'dtype': 'uint8', 'status': status}
+    if status == 'ok':
+        result.update(seconds_min=seconds, traced_peak_mb=traced, rss_growth_mb=rss)
+    return {**result, **extra}
+
+
+def test_compare_accepts_unchanged_results():
+    assert compare([case()], {'results': [case()]}, 0.25) == []
+
+
+def test_compare_flags_a_case_that_started_failing():
+    regressions = compare([case(status='error', error='ValueError: bad')], {'results': [case()]}, 0.25)
+    assert regressions == [f"{case_key(case())}: ok -> error (ValueError: bad)"]
+
+
+def test_compare_flags_memory_growth():
+    regressions = compare([case(traced=20.0)], {'results': [case()]}, 0.25)
+    assert len(regressions) == 1 and 'traced_peak_mb' in regressions[0]
+    regressions = compare([case(rss=40.0)], {'results': [case()]}, 0.25, memory_threshold=0.5)
+    assert len(regressions) == 1 and 'rss_growth_mb' in regressions[0]
+    # Small absolute changes are noise
+    assert compare([case(traced=0.5)], {'results': [case(traced=0.1)]}, 0.25) == []
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/clear_refs'), reason="needs Linux /proc")
+def test_rss_growth_excludes_the_input_image(monkeypatch):
+    # Copying the image is the only allocation the "filter" makes
+    monkeypatch.setattr(bench_filters, 'apply_step', lambda image, name, params: image.copy())
+    result = bench_filters.run_case(('copy', 12, 'rgb', 'uint8', 1))
+    image_mb = np.prod(bench_filters.synthetic_image(12, 'rgb', 'uint8').shape) / 2 ** 20
+    assert result['status'] == 'ok'
+    assert result['rss_growth_mb'] < 1.5 * image_mb
+    assert result['peak_rss_mb'] > image_mb
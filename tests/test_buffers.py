@@ -0,0 +1,40 @@
+import numpy as np
+
+from utils.buffers import SessionMemory, compact, memory_usage, owner
+from utils.cache import DiskCache
+
+
+def test_views_are_charged_once_for_their_buffer(photo):
+    crop = photo[10:50, 10:50]
+    usage = memory_usage([photo, crop, {'pyramid': [crop, photo[::2]]}])
+    assert usage == {'resident': photo.nbytes, 'mapped': 0, 'buffers': 1}
+    assert memory_usage([crop])['resident'] == photo.nbytes
+
+
+def test_memory_mapped_arrays_are_not_resident(tmp_path, photo):
+    disk = DiskCache(str(tmp_path), max_bytes=10 * photo.nbytes)
+    disk.put('a', photo)
+    usage = memory_usage([disk.get('a'), photo[:1].copy()])
+    assert usage['mapped'] >= photo.nbytes
+    assert usage['resident'] == photo[:1].nbytes
+
+
+def test_small_views_of_intermediates_are_copied(photo):
+    intermediate = photo.copy()
+    small = intermediate[:10, :10]
+    copied = compact(small)
+    assert owner(copied) is copied and not copied.flags.writeable
+    # Views of a buffer that stays alive anyway, or large views, are kept
+    assert compact(small, keep=(intermediate,)) is small
+    large = intermediate[:200]
+    assert compact(large) is large
+
+
+def test_session_memory_forgets_idle_sessions(monkeypatch):
+    sessions = SessionMemory(idle_seconds=10)
+    clock = [100.0]
+    monkeypatch.setattr('utils.buffers.time.monotonic', lambda: clock[0])
+    sessions.update('a', {'resident': 5, 'mapped': 1, 'buffers': 1})
+    clock[0] += 20
+    sessions.update('b', {'resident': 7, 'mapped': 0, 'buffers': 1})
+    assert sessions.stats() == {'entries': 1, 'bytes': 7, 'mapped_bytes': 0, 'max_session_bytes': 7}
@@ -0,0 +1,102 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.cache import ByteLRUCache, DiskCache, TieredCache
+from utils.image_io import DecodeCache, EncodeCache
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_lru_evicts_least_recently_used_within_budget():
+    cache = ByteLRUCache(max_bytes=300)
+    for key in 'abc':
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    cache.get('a')
+    cache.put('d', np.zeros(100, dtype=np.uint8))
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.stats()['bytes'] == 300
+    assert cache.stats()['evictions'] == 1
+    # Values larger than the whole budget are not stored
+    assert not cache.put('huge', np.zeros(301, dtype=np.uint8))
+
+
+def test_decode_cache_decodes_each_upload_once(photo):
+    data = png_bytes(photo)
+    cache = DecodeCache(max_bytes=10 * photo.nbytes)
+    key, image = cache.load(data)
+    again_key, again = cache.load(bytes(data))
+    assert key == again_key and again is image
+    assert np.array_equal(image, photo)
+    assert not image.flags.writeable
+    assert cache.stats()['hits'] == 1
+
+
+def test_decode_cache_keys_include_the_pixel_cap(photo):
+    data = png_bytes(photo)
+    cache = DecodeCache(max_bytes=10 * photo.nbytes)
+    full_key, full = cache.load(data)
+    capped_key, capped = cache.load(data, max_pixels=photo.shape[0] * photo.shape[1] // 4)
+    assert full_key != capped_key
+    assert capped.shape[0] * capped.shape[1] <= photo.shape[0] * photo.shape[1] // 4 + photo.shape[0]
+    assert full.shape == photo.shape
+
+
+def test_decode_rejects_unsupported_formats():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, format='GIF')
+    with pytest.raises(ValueError):
+        DecodeCache(1 << 20).load(buffer.getvalue())
+
+
+def test_encoded_downloads_are_cached_per_format_and_options(photo):
+    cache = EncodeCache(max_bytes=10 * photo.nbytes)
+    png = cache.encode('k', photo, 'PNG', compress_level=1)
+    assert cache.encode('k', photo, 'PNG', compress_level=1) is png
+    assert cache.encode('k', photo, 'PNG', compress_level=9) is not png
+    jpeg = cache.encode('k', photo, 'JPEG', quality=90)
+    assert Image.open(io.BytesIO(jpeg)).format == 'JPEG'
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(png))), photo)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_disk_cache_round_trips_read_only_arrays(tmp_path, photo, compress):
+    cache = DiskCache(str(tmp_path), max_bytes=10 * photo.nbytes, compress=compress)
+    assert cache.put('abc123', photo)
+    value = cache.get('abc123')
+    assert np.array_equal(value, photo) and not value.flags.writeable
+    # Another process (a new instance) sees the same entry
+    assert np.array_equal(DiskCache(str(tmp_path), 10 * photo.nbytes, compress).get('abc123'), photo)
+    assert not cache.put('objects', np.array([object()]))
+
+
+def test_disk_cache_evicts_least_recently_used_files(tmp_path, photo):
+    cache = DiskCache(str(tmp_path), max_bytes=int(2.5 * photo.nbytes))
+    cache.put('a', photo)
+    cache.put('b', photo)
+    os.utime(tmp_path / 'a.npy', (1, 1))
+    os.utime(tmp_path / 'b.npy', (2, 2))
+    cache.get('a')
+    cache.put('c', photo)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path, photo):
+    disk = DiskCache(str(tmp_path), max_bytes=10 * photo.nbytes)
+    disk.put('k', photo)
+    cache = TieredCache(ByteLRUCache(10 * photo.nbytes), disk)
+    assert 'k' in cache and 'k' not in cache.memory
+    assert np.array_equal(cache.get('k'), photo)
+    assert 'k' in cache.memory
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_entries']) == (1, 1, 1)
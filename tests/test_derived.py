@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils import recipes
+from utils.derived import DERIVED_CACHE, add_noise, noise_offsets
+
+
+@pytest.mark.parametrize('noise_type', ['gaussian', 'salt_pepper', 'poisson'])
+def test_seeded_noise_is_reproducible(photo, noise_type):
+    first = add_noise(photo, noise_type, 0.2, seed=7)
+    assert np.array_equal(first, add_noise(photo, noise_type, 0.2, seed=7))
+    assert not np.array_equal(first, add_noise(photo, noise_type, 0.2, seed=8))
+    assert first.dtype == np.uint8 and first.shape == photo.shape
+
+
+def test_noise_fields_are_cached_read_only():
+    field = noise_offsets((40, 30, 3), 'gaussian', 0.1, 3)
+    hits = DERIVED_CACHE.stats()['hits']
+    assert noise_offsets((40, 30, 3), 'gaussian', 0.1, 3) is field
+    assert DERIVED_CACHE.stats()['hits'] == hits + 1
+    assert not field.flags.writeable
+
+
+def test_unseeded_noise_uses_the_filter_module(photo, monkeypatch):
+    calls = []
+    image_filters = SimpleNamespace(apply_noise=lambda image, *args: calls.append(args) or image)
+    monkeypatch.setattr(recipes, 'filters', SimpleNamespace(ImageFilters=image_filters))
+    recipes.apply_step(photo, 'noise', {'noise_type': 'gaussian', 'intensity': 0.1})
+    assert calls == [('gaussian', 0.1)]
+    seeded = recipes.apply_step(photo, 'noise', {'noise_type': 'gaussian', 'intensity': 0.1, 'seed': 1})
+    assert len(calls) == 1
+    assert np.array_equal(seeded, add_noise(photo, 'gaussian', 0.1, 1))
+
+
+@pytest.mark.parametrize('noise_type', ['gaussian', 'salt_pepper', 'poisson'])
+def test_seeded_noise_keeps_16_bit_images(noise_type):
+    image = np.full((20, 30, 3), 40000, dtype=np.uint16)
+    noisy = add_noise(image, noise_type, 0.1, seed=2)
+    assert noisy.dtype == np.uint16
+    assert abs(float(np.median(noisy)) - 40000) < 2000
+    with pytest.raises(ValueError):
+        add_noise(image.astype(np.float32), noise_type, 0.1, seed=2)
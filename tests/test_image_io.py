@@ -0,0 +1,47 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from batch import plan_decode
+from utils.image_io import decode_image, read_size
+
+
+def encoded(image, format, **options):
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+# Uncompressed strips take the partial-read path, LZW falls back to a full decode
+@pytest.mark.parametrize('options', [{}, {'compression': 'tiff_lzw'}])
+def test_tiff_region_decode_matches_a_full_decode(photo, options):
+    data = encoded(photo, 'TIFF', **options)
+    region = (30, 70, 190, 260)
+    assert np.array_equal(decode_image(data, region=region), photo[70:260, 30:190])
+
+
+def test_region_is_clipped_to_the_image(photo):
+    data = encoded(photo, 'PNG')
+    assert decode_image(data, region=(-10, -10, 50, 5000)).shape == (300, 50, 3)
+
+
+def test_jpeg_decodes_near_the_target_size(photo):
+    image = np.tile(photo, (4, 4, 1))
+    data = encoded(image, 'JPEG', quality=95)
+    assert read_size(data) == (880, 1200)
+    small = decode_image(data, target_size=(200, 260))
+    assert small.shape[1] >= 200 and small.shape[0] >= 260
+    assert small.shape[1] < 440
+    assert decode_image(data, max_pixels=100_000).size // 3 <= 100_000
+
+
+def test_leading_crop_and_resize_fold_into_the_decode():
+    steps = [('crop', {'left': 100, 'top': 50, 'right': 900, 'bottom': 650}), ('resize', {'scale': 0.5}), ('sepia', {})]
+    region, target_size, remaining = plan_decode(steps, (1000, 800))
+    assert region == (100, 50, 900, 650)
+    assert target_size == (400, 300)
+    assert remaining == [('resize', {'width': 400, 'height': 300}), ('sepia', {})]
+    # Upscaling is left to the resize step
+    assert plan_decode([('resize', {'width': 2000, 'height': 1600})], (1000, 800))[1] is None
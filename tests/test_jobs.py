@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from utils.jobs import JobQueue, QueueFull
+
+
+def blocking_job(started, release, result):
+    """Job body that runs until ``release`` is set, stopping early when cancelled."""
+    def run(report, is_cancelled):
+        started.set()
+        while not release.wait(0.01):
+            if is_cancelled():
+                raise RuntimeError('cancelled')
+        return result
+    return run
+
+
+def test_identical_requests_share_one_job():
+    queue = JobQueue(max_workers=2, max_pending=4)
+    started, release = threading.Event(), threading.Event()
+    first = queue.submit('a', 'K', blocking_job(started, release, 1))
+    second = queue.submit('b', 'K', blocking_job(started, release, 2))
+    release.set()
+    assert first is second
+    assert first.result() == 1
+
+
+def test_superseded_job_is_cancelled():
+    queue = JobQueue(max_workers=2, max_pending=4)
+    started, release = threading.Event(), threading.Event()
+    old = queue.submit('a', 'K', blocking_job(started, release, 1))
+    started.wait(1)
+    new = queue.submit('a', 'K2', blocking_job(threading.Event(), release, 2))
+    assert old.is_cancelled()
+    release.set()
+    assert new.result() == 2
+
+
+def test_resubmitting_a_cancelled_key_starts_a_new_job():
+    queue = JobQueue(max_workers=2, max_pending=4)
+    started, release = threading.Event(), threading.Event()
+    old = queue.submit('a', 'K', blocking_job(started, release, 'old'))
+    started.wait(1)
+    queue.submit('a', 'K2', blocking_job(threading.Event(), threading.Event(), 'other'))
+    assert old.is_cancelled()
+    # K is cancelled but may still be running: a new request must not join it
+    again = queue.submit('a', 'K', blocking_job(threading.Event(), release, 'new'))
+    release.set()
+    assert again is not old
+    assert not again.is_cancelled()
+    assert again.result() == 'new'
+
+
+def test_queue_full_raises():
+    queue = JobQueue(max_workers=1, max_pending=1)
+    release = threading.Event()
+    queue.submit('a', 'K', blocking_job(threading.Event(), release, 1))
+    with pytest.raises(QueueFull):
+        queue.submit('b', 'K2', blocking_job(threading.Event(), release, 2))
+    release.set()
+
+
+def test_finished_jobs_are_forgotten():
+    queue = JobQueue(max_workers=2, max_pending=8)
+    jobs = [queue.submit(('session', index), f'K{index}', lambda report, is_cancelled: b'x' * 1000)
+            for index in range(5)]
+    for job in jobs:
+        job.result()
+    # Done callbacks may run just after result() returns
+    deadline = time.monotonic() + 5
+    while queue.stats()['owners'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue.stats() == {'in_flight': 0, 'owners': 0}
+    # Releasing an owner whose job already finished is harmless
+    queue.release(('session', 0))
@@ -0,0 +1,49 @@
+import numpy as np
+
+from utils import lut, recipes
+
+POINTWISE = [
+    ('brightness_contrast', {'brightness': 30, 'contrast': -20}),
+    ('invert', {}),
+    ('sepia', {}),
+    ('brightness_contrast', {'brightness': -10, 'contrast': 40}),
+]
+
+
+def step_by_step(image, steps):
+    for name, params in steps:
+        image = recipes.apply_step(image, name, params)
+    return image
+
+
+def test_pointwise_steps_are_described(pointwise_steps):
+    matrix, table = lut.describe_step('invert')
+    assert matrix is None and table.shape == (256, 3)
+    # A channel swap is not a per-channel table, but it is a colour matrix
+    matrix, _ = lut.describe_step('sepia')
+    assert matrix.shape == (3, 4)
+    assert lut.describe_step('box') is None
+
+
+def test_fused_run_matches_step_by_step(pointwise_steps, photo):
+    passes = lut.compose([lut.describe_step(*step) for step in POINTWISE])
+    # Tables around the matrix merge: table, matrix + table
+    assert len(passes) == 2
+    assert np.array_equal(lut.apply_passes(photo, passes), step_by_step(photo, POINTWISE))
+
+
+def test_apply_steps_fuses_around_other_steps(pointwise_steps, photo):
+    steps = POINTWISE[:2] + [('box', {})] + POINTWISE[2:]
+    assert np.array_equal(lut.apply_steps(photo, steps), step_by_step(photo, steps))
+
+
+def test_fusion_leaves_the_input_untouched(pointwise_steps, photo):
+    original = photo.copy()
+    lut.apply_steps(photo, POINTWISE)
+    assert np.array_equal(photo, original)
+
+
+def test_non_rgb_images_are_not_fused(pointwise_steps, photo):
+    gray = np.ascontiguousarray(photo[..., 0])
+    assert not lut.can_fuse(gray)
+    assert np.array_equal(lut.apply_steps(gray, POINTWISE[:2]), step_by_step(gray, POINTWISE[:2]))
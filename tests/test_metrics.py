@@ -0,0 +1,32 @@
+from utils.cache import ByteLRUCache
+from utils.metrics import Metrics
+
+
+def test_spans_report_counts_and_percentiles():
+    metrics = Metrics()
+    for seconds in (0.001, 0.002, 0.003, 0.004, 0.100):
+        metrics.observe('filter', seconds, filter='blur')
+    with metrics.span('decode'):
+        pass
+    rows = {row['stage']: row for row in metrics.latency_summary()}
+    assert rows['filter']['count'] == 5
+    assert rows['filter']['filter'] == 'blur'
+    assert rows['filter']['p50_ms'] == 3.0
+    assert rows['filter']['p95_ms'] == 100.0
+    assert rows['decode']['count'] == 1
+
+
+def test_prometheus_export_includes_counters_and_caches():
+    metrics = Metrics()
+    metrics.inc('bytes_sent_total', 10)
+    metrics.inc('bytes_sent_total', 5)
+    metrics.observe('encode', 0.5, format='PNG')
+    cache = ByteLRUCache(100)
+    cache.put('a', b'xyz')
+    cache.get('a')
+    metrics.register_cache('preview', cache)
+    text = metrics.prometheus_text()
+    assert 'imagefilter_bytes_sent_total 15' in text
+    assert 'imagefilter_stage_seconds_count{stage="encode",format="PNG"} 1' in text
+    assert 'imagefilter_cache_hits_total{cache="preview"} 1' in text
+    assert 'imagefilter_cache_bytes{cache="preview"} 3' in text
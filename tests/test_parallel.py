@@ -0,0 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import config
+from utils import parallel
+
+
+@pytest.fixture
+def bands(monkeypatch):
+    monkeypatch.setattr(config, 'PARALLEL_WORKERS', 4)
+    monkeypatch.setattr(config, 'PARALLEL_MIN_PIXELS', 0)
+
+
+def test_banded_output_matches_whole_image(box_step, photo):
+    expected = parallel.apply_step(photo, 'box')
+    assert np.array_equal(parallel.apply_banded(photo, 'box', halo=4, bands=5), expected)
+
+
+def test_run_parallel_matches_whole_image(box_step, bands, photo):
+    assert np.array_equal(parallel.run_parallel(photo, 'box'), parallel.apply_step(photo, 'box'))
+
+
+def test_unverified_halo_runs_unsplit(box_step, bands, photo, monkeypatch):
+    box_step(1)
+    calls = []
+    monkeypatch.setattr(parallel, 'apply_banded', lambda *args, **kwargs: calls.append(args))
+    result = parallel.run_parallel(photo, 'box')
+    assert calls == []
+    assert np.array_equal(result, parallel.apply_step(photo, 'box'))
+
+
+def test_pool_workers_filter_on_one_thread(monkeypatch):
+    monkeypatch.setattr(config, 'PARALLEL_WORKERS', 4)
+    with ProcessPoolExecutor(max_workers=1, initializer=parallel.init_pool_worker) as executor:
+        assert executor.submit(parallel.worker_count).result() == 1
+    assert parallel.worker_count() == 4
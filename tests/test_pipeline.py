@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from utils import lut, recipes
+from utils.pipeline import Pipeline
+
+STEPS = [
+    ('brightness_contrast', {'brightness': 20, 'contrast': 10}),
+    ('invert', {}),
+    ('box', {}),
+    ('sepia', {}),
+    ('invert', {}),
+]
+
+
+class DictCache(dict):
+    def put(self, key, value):
+        self[key] = value
+
+
+def unfused(image, steps):
+    for name, params in steps:
+        image = recipes.apply_step(image, name, params)
+    return image
+
+
+def test_fused_pipeline_matches_step_by_step(pointwise_steps, photo):
+    assert lut.fusable_run(STEPS, 0) == 2
+    result, _ = Pipeline([{'name': name, 'params': params} for name, params in STEPS]).run(photo, 'in', DictCache())
+    assert np.array_equal(result, unfused(photo, STEPS))
+    assert not result.flags.writeable
+
+
+def test_editing_a_step_resumes_from_the_stage_before_it(pointwise_steps, photo, monkeypatch):
+    pipeline = Pipeline()
+    for name, params in STEPS:
+        pipeline.append(name, params)
+    cache = DictCache()
+    pipeline.run(photo, 'in', cache)
+    calls = []
+    monkeypatch.setattr('utils.pipeline.run_step', lambda image, name, params: calls.append(name) or image)
+    pipeline.replace(3, 'box', {})
+    pipeline.run(photo, 'in', cache)
+    assert calls == ['box']
+
+
+def test_output_size_follows_size_changing_steps(monkeypatch):
+    monkeypatch.setattr(recipes, '_probed_sizes', {})
+    monkeypatch.setitem(recipes.FILTERS, 'transpose', lambda image: image.swapaxes(0, 1))
+    pipeline = Pipeline()
+    pipeline.append('crop', {'left': 10, 'top': 0, 'right': 110, 'bottom': 500})
+    pipeline.append('transpose')
+    pipeline.append('resize', {'width': 64, 'height': 48})
+    pipeline.append('sharpen')
+    assert pipeline.output_size((400, 300), upto=0) == (400, 300)
+    # The crop is clipped to the image
+    assert pipeline.output_size((400, 300), upto=1) == (400, 100)
+    assert pipeline.output_size((400, 300), upto=2) == (100, 400)
+    assert pipeline.output_size((400, 300)) == (48, 64)
+    assert pipeline.output_size((400, 300, 4)) == (48, 64, 4)
+
+
+def test_output_size_probes_a_small_proxy(monkeypatch):
+    monkeypatch.setattr(recipes, '_probed_sizes', {})
+    shapes = []
+
+    def transpose(image):
+        shapes.append(image.shape)
+        return image.swapaxes(0, 1)
+    monkeypatch.setitem(recipes.FILTERS, 'transpose', transpose)
+    monkeypatch.setitem(recipes.FILTERS, 'mirror', lambda image, direction: pytest.fail("mirror was probed"))
+    assert recipes.output_size('transpose', {}, (4000, 3000, 1)) == (3000, 4000, 1)
+    assert recipes.output_size('mirror', {'direction': 'horizontal'}, (4000, 3000)) == (4000, 3000)
+    assert shapes == [(256, 192, 1)]
+
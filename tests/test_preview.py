@@ -0,0 +1,22 @@
+import numpy as np
+
+from utils.preview import PreviewService, build_pyramid, select_level
+
+
+def test_pyramid_levels_halve_down_to_the_display_width(photo):
+    image = np.tile(photo, (4, 4, 1))
+    levels = build_pyramid(image, 200)
+    assert [level.shape[1] for level in levels] == [880, 440, 220]
+    assert select_level(levels, 300) is levels[1]
+    assert select_level(levels, 1000) is levels[0]
+
+
+def test_preview_is_cached_per_shown_level(photo):
+    service = PreviewService(10 * 2 ** 20, max_width=1000, format='PNG')
+    levels = build_pyramid(np.tile(photo, (2, 2, 1)), 200)
+    full = service.get('key', levels[0])
+    assert service.get('key', levels[0]) is full
+    # Toggling preview mode shows another level of the same image
+    half = service.get('key', levels[1])
+    assert half != full
+    assert service.get('key', levels[1]) is half
@@ -0,0 +1,28 @@
+import pytest
+
+from utils.recipes import parse_recipe, scale_params
+
+
+def test_short_and_json_recipes_parse_to_the_same_steps():
+    short = parse_recipe('blur:kernel_size=9; sepia')
+    assert short == [('blur', {'kernel_size': 9}), ('sepia', {})]
+    assert parse_recipe('[{"name": "blur", "params": {"kernel_size": 9}}, {"name": "sepia"}]') == short
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(ValueError, match='Unknown filter'):
+        parse_recipe('sepia;posterize')
+
+
+@pytest.mark.parametrize('name, params, factor, expected', [
+    ('blur', {'kernel_size': 15}, 0.5, {'kernel_size': 9}),
+    ('blur', {'kernel_size': 3}, 0.1, {'kernel_size': 1}),
+    ('crop', {'left': 10, 'top': 20, 'right': 110, 'bottom': 220}, 0.5,
+     {'left': 5, 'top': 10, 'right': 55, 'bottom': 110}),
+    ('resize', {'width': 400, 'height': 300}, 0.25, {'width': 100, 'height': 75}),
+    ('resize', {'scale': 0.5}, 0.25, {'scale': 0.5}),
+    ('rotate', {'angle': 30}, 0.25, {'angle': 30}),
+])
+def test_pixel_parameters_follow_the_preview_scale(name, params, factor, expected):
+    assert scale_params(name, params, factor) == expected
+    assert scale_params(name, params, 1.0) == params
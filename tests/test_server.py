@@ -0,0 +1,162 @@
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from urllib.parse import quote
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from server import ROUTES, FilterRequestHandler, FilterServer, FilterService, parse_multipart
+from utils.metrics import METRICS
+
+
+class PlainService(FilterService):
+    """FilterService whose workers skip the filter warm-up, so no filters are needed."""
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+@pytest.fixture
+def service():
+    service = PlainService(workers=1, max_pending=4)
+    service.warm_up()
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def server(service):
+    server = FilterServer(('127.0.0.1', 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def kill_worker(service):
+    for pid in list(service._executor._processes):
+        os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not service.broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert service.broken
+
+
+def test_parse_multipart_splits_fields_and_files():
+    body = (
+        b'--b\r\nContent-Disposition: form-data; name="recipe"\r\n\r\nsepia\r\n'
+        b'--b\r\nContent-Disposition: form-data; name="image"; filename="a.png"\r\n'
+        b'Content-Type: image/png\r\n\r\nPNGDATA\r\n--b--\r\n'
+    )
+    fields, files = parse_multipart('multipart/form-data; boundary=b', body)
+    assert fields == {'recipe': 'sepia'}
+    assert files == [('a.png', b'PNGDATA')]
+
+
+@pytest.mark.parametrize('recipe', ['[1]', '[{"name": 1}]', '[{"name": "blur", "params": 3}]', '[', 'nope'])
+def test_malformed_recipe_is_a_bad_request(server, recipe):
+    status, body = request(server, 'POST', f'/process?recipe={quote(recipe)}', b'x', {'Content-Type': 'image/png'})
+    assert status == 400
+    assert 'Invalid recipe' in json.loads(body)['error']
+
+
+def test_invalid_content_length_is_a_bad_request(server):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+    connection.putrequest('POST', '/process?recipe=sepia')
+    connection.putheader('Content-Length', 'abc')
+    connection.endheaders()
+    assert connection.getresponse().status == 400
+    connection.close()
+
+
+def test_unknown_paths_share_one_metric_label(server):
+    request(server, 'GET', '/no/such/page')
+    request(server, 'GET', '/another-one')
+    labels = {row.get('endpoint') for row in METRICS.latency_summary() if row['stage'] == 'request'}
+    assert '/no/such/page' not in labels
+    assert labels <= set(ROUTES.values()) | {'other'}
+
+
+def test_broken_pool_is_reported_and_replaced(server, service):
+    kill_worker(service)
+    status, body = request(server, 'GET', '/health')
+    assert status == 503
+    assert json.loads(body)['status'] == 'broken'
+
+    status, _ = request(server, 'POST', '/process?recipe=sepia', b'x', {'Content-Type': 'image/png'})
+    assert status == 503
+    assert service.pending == 0
+    assert service.restarts == 1
+
+    status, body = request(server, 'GET', '/health')
+    assert status == 200
+    assert json.loads(body)['entries'] == 0
+
+
+def test_unexpected_error_is_answered_with_500(server, monkeypatch):
+    def fail(handler, query):
+        raise TypeError('boom')
+    monkeypatch.setattr(FilterRequestHandler, 'handle_process', fail)
+    status, body = request(server, 'POST', '/process?recipe=sepia', b'x', {'Content-Type': 'image/png'})
+    assert status == 500
+    assert json.loads(body) == {'error': 'Internal server error'}
+
+
+def png(image):
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_process_and_batch_return_filtered_images(server, photo):
+    # A leading crop is folded into the decode, so no filter module is needed
+    query = '?recipe=' + quote('crop:left=0,top=0,right=40,bottom=30') + '&format=png'
+    status, body = request(server, 'POST', '/process' + query, png(photo), {'Content-Type': 'image/png'})
+    assert status == 200
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(body))), photo[:30, :40])
+
+    boundary = 'b0undary'
+    parts = b''.join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="{name}"\r\n\r\n'.encode()
+        + data + b'\r\n'
+        for name, data in (('a.png', png(photo)), ('b.png', b'not an image'))
+    )
+    status, body = request(server, 'POST', '/batch' + query, parts + f'--{boundary}--\r\n'.encode(),
+                           {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    assert status == 200
+    statuses = {
+        part.get_filename(): part['X-Status']
+        for part in BytesParser(policy=policy.HTTP).parsebytes(
+            b'Content-Type: multipart/mixed; boundary=' + body.split(b'\r\n', 1)[0][2:] + b'\r\n\r\n' + body
+        ).iter_parts()
+    }
+    assert statuses == {'a.png': '200', 'b.png': '422'}
+    assert service_pending(server) == 0
+
+
+def service_pending(server):
+    deadline = time.monotonic() + 5
+    while server.service.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.service.pending
@@ -0,0 +1,34 @@
+import sys
+
+from benchmarks.import_report import LOGIN_FORBIDDEN, STREAMLIT_STUB, measure
+from utils.metrics import METRICS
+from utils.startup import LAZY_MODULES, lazy_import
+
+
+def import_spans(module):
+    return sum(row['count'] for row in METRICS.latency_summary()
+               if row['stage'] == 'import' and row.get('module') == module)
+
+
+def test_lazy_import_returns_one_proxy_per_module():
+    # Streamlit re-executes app.py on every rerun
+    proxies = [lazy_import('json') for _ in range(3)]
+    assert all(proxy is proxies[0] for proxy in proxies)
+    assert list(LAZY_MODULES).count('json') == 1
+
+
+def test_only_a_real_import_is_recorded():
+    sys.modules.pop('colorsys', None)
+    before = import_spans('colorsys')
+    for _ in range(3):
+        lazy_import('colorsys').rgb_to_hsv(0.1, 0.2, 0.3)
+    assert import_spans('colorsys') == before + 1
+    # Already imported elsewhere: no span at all
+    lazy_import('textwrap').dedent('')
+    assert import_spans('textwrap') == 0
+
+
+def test_login_page_does_not_load_the_image_stack():
+    _, loaded = measure(['app'], STREAMLIT_STUB)
+    assert 'utils.startup' in loaded
+    assert [module for module in LOGIN_FORBIDDEN if module in loaded] == []
@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+
+import config
+from utils import parallel, recipes, tiling
+from utils.parallel import verified_halo
+
+
+def test_tiled_output_matches_whole_image(box_step, photo):
+    tiled = tiling.apply_tiled(photo, 'box', halo=4, tile=64)
+    assert np.array_equal(tiled, tiling.apply_step(photo, 'box'))
+
+
+def test_run_step_tiles_over_budget_and_matches(box_step, photo, monkeypatch):
+    monkeypatch.setattr(config, 'TILE_MEMORY_BUDGET', photo.nbytes)
+    assert tiling.needs_tiling(photo)
+    assert np.array_equal(tiling.run_step(photo, 'box'), tiling.apply_step(photo, 'box'))
+
+
+def test_too_small_halo_is_rejected(box_step, photo, monkeypatch):
+    box_step(2)
+    assert verified_halo('box', {}, photo) is None
+    monkeypatch.setattr(config, 'TILE_MEMORY_BUDGET', photo.nbytes)
+    # Falls back to the whole image instead of producing seams
+    assert np.array_equal(tiling.run_step(photo, 'box'), tiling.apply_step(photo, 'box'))
+
+
+def test_halo_verdict_depends_on_the_pixel_layout(box_step, photo):
+    assert verified_halo('box', {}, photo) == 4
+    assert verified_halo('box', {}, photo[..., 0].copy()) == 4
+    assert len(parallel._halo_verdicts) == 2
+
+
+def equalize_luma(image):
+    yuv = cv2.cvtColor(image, cv2.COLOR_RGB2YUV)
+    yuv[..., 0] = cv2.equalizeHist(yuv[..., 0])
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB)
+
+
+def test_two_pass_equalization_matches_whole_image(photo, monkeypatch):
+    monkeypatch.setitem(recipes.FILTERS, 'histogram_equalization', equalize_luma)
+    tiling.two_pass_supported.cache_clear()
+    monkeypatch.setattr(config, 'TILE_MEMORY_BUDGET', photo.nbytes)
+    try:
+        assert tiling.two_pass_supported('histogram_equalization')
+        assert np.array_equal(tiling.run_step(photo, 'histogram_equalization'), equalize_luma(photo))
+    finally:
+        tiling.two_pass_supported.cache_clear()
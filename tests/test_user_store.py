@@ -0,0 +1,103 @@
+import json
+import threading
+
+import pytest
+
+from utils import user_store
+from utils.user_store import StoreBusy, check_password, create_user_store, hash_password
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(user_store, 'SCRYPT_PARAMS', {'n': 2 ** 4, 'r': 8, 'p': 1})
+
+
+@pytest.fixture
+def legacy_json(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps({
+        'old': 'plain-password',
+        'new': {'password': 'secret', 'email': 'new@example.com', 'created_at': '2024-01-01'},
+    }))
+    return path
+
+
+def test_password_hashes_are_salted_and_checked():
+    first, second = hash_password('pw'), hash_password('pw')
+    assert first != second and 'pw' not in first
+    assert check_password('pw', first) and not check_password('other', first)
+    assert not check_password('pw', 'not a hash')
+
+
+def test_legacy_users_are_imported_once(tmp_path, legacy_json):
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    assert store.verify_password('old', 'plain-password')
+    assert store.verify_password('new', 'secret')
+    assert store.find_by_email('new@example.com')['username'] == 'new'
+    store.add_user('later', 'pw')
+    # A second start must not re-import or reset anything
+    legacy_json.write_text(json.dumps({'old': 'changed'}))
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    assert store.verify_password('old', 'plain-password')
+    assert store.get_user('later') is not None
+
+
+def test_missing_legacy_file_creates_demo_users(tmp_path):
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(tmp_path / 'missing.json'))
+    assert store.verify_password('admin', 'admin123')
+
+
+def test_usernames_are_unique(tmp_path, legacy_json):
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    assert store.add_user('alice', 'pw', 'alice@example.com')
+    assert not store.add_user('alice', 'other')
+    assert store.verify_password('alice', 'pw')
+    assert not store.verify_password('nobody', 'pw')
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        create_user_store('ldap', str(tmp_path / 'users.db'))
+
+
+@pytest.mark.parametrize('content', ['{"old": ', '["old"]'])
+def test_malformed_legacy_file_is_skipped_until_fixed(tmp_path, legacy_json, content):
+    good = legacy_json.read_text()
+    legacy_json.write_text(content)
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    assert store.get_user('old') is None and store.get_user('admin') is None
+    legacy_json.write_text(good)
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    assert store.verify_password('old', 'plain-password')
+
+
+def test_legacy_users_are_hashed_in_parallel(tmp_path, monkeypatch):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps({f'user{index}': f'pw{index}' for index in range(20)}))
+    threads = set()
+    hash_once = user_store.hash_password
+
+    def recording_hash(password):
+        threads.add(threading.current_thread().name)
+        return hash_once(password)
+    monkeypatch.setattr(user_store, 'hash_password', recording_hash)
+    monkeypatch.setattr(user_store.os, 'cpu_count', lambda: 4)
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(path))
+    assert store.verify_password('user19', 'pw19')
+    assert all(name.startswith('migration-hash') for name in threads)
+
+
+def test_saturated_hashing_raises_store_busy(tmp_path, legacy_json, monkeypatch):
+    store = create_user_store('sqlite', str(tmp_path / 'users.db'), str(legacy_json))
+    store.get_user('old')
+    monkeypatch.setattr(user_store, 'HASH_WAIT_SECONDS', 0.05)
+    release = threading.Event()
+    blockers = [user_store._hash_executor.submit(release.wait) for _ in range(2)]
+    try:
+        with pytest.raises(StoreBusy):
+            store.verify_password('old', 'plain-password')
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+    assert store.verify_password('old', 'plain-password')
@@ -0,0 +1,106 @@
+"""Vectorised recipe steps over stacks of same-sized images.
+
+``apply_step_batch`` takes an N x H x W x C stack (or a list of equally
+shaped images) and runs a step over all of them at once:
+
+* point-wise steps (adjustments, sepia, grayscale) go through the fused LUT
+  engine as a single pass over the whole stack, with the table or colour
+  matrix built once per batch;
+* crops and mirrors are a single slice or flip of the stack;
+* everything else runs per image into one preallocated output. Running
+  OpenCV's spatial filters once over a channel-stacked H x W x (N*C) array
+  was measured slower than per-image calls (OpenCV only has fast paths for
+  1-4 channels), so those steps are not stacked.
+
+A vectorised kernel is only used after it has reproduced the real filter on
+an image of the same shape and parameters; the verdict is memoised.
+"""
+import json
+
+import numpy as np
+
+from utils.lut import apply_passes, compose, describe_step, fusable_run
+from utils.recipes import apply_step
+
+
+def as_stack(images):
+    """Return ``images`` as one contiguous N x H x W x C array."""
+    if isinstance(images, np.ndarray):
+        return np.ascontiguousarray(images)
+    shapes = {image.shape for image in images}
+    if len(shapes) != 1:
+        raise ValueError(f"Batch images must share one shape, got {sorted(shapes)}")
+    return np.stack(images)
+
+
+def _mirror(stack, direction='horizontal'):
+    return np.ascontiguousarray(np.flip(stack, axis=2 if direction == 'horizontal' else 1))
+
+
+def _crop(stack, left, top, right, bottom):
+    return stack[:, top:bottom, left:right]
+
+
+BATCH_KERNELS = {
+    'mirror': _mirror,
+    'crop': _crop,
+}
+
+
+# (name, params, image shape, dtype) -> whether the kernel matched the filter
+_kernel_verdicts = {}
+
+
+def kernel_supported(name, params, stack):
+    """True when the vectorised kernel for ``name`` reproduces the real filter for this shape."""
+    if name not in BATCH_KERNELS:
+        return False
+    key = (name, json.dumps(params, sort_keys=True), stack.shape[1:], stack.dtype.str)
+    if key not in _kernel_verdicts:
+        expected = apply_step(stack[0], name, params)
+        actual = BATCH_KERNELS[name](stack[:1], **params)[0]
+        _kernel_verdicts[key] = actual.shape == expected.shape and np.array_equal(actual, expected)
+    return _kernel_verdicts[key]
+
+
+def _loop(stack, name, params):
+    output = None
+    for index, image in enumerate(stack):
+        result = apply_step(image, name, params)
+        if output is None:
+            output = np.empty((len(stack),) + result.shape, dtype=result.dtype)
+        output[index] = result
+    return output
+
+
+def _is_rgb8(stack):
+    return stack.dtype == np.uint8 and stack.ndim == 4 and stack.shape[3] == 3
+
+
+def apply_step_batch(images, name, params=None):
+    """Run one step over a batch of same-sized images and return an N x ... stack."""
+    params = params or {}
+    stack = as_stack(images)
+    if _is_rgb8(stack) and describe_step(name, params) is not None:
+        flat = stack.reshape(-1, stack.shape[2], 3)
+        return apply_passes(flat, compose([describe_step(name, params)])).reshape(stack.shape)
+    if kernel_supported(name, params, stack):
+        return BATCH_KERNELS[name](stack, **params)
+    return _loop(stack, name, params)
+
+
+def apply_recipe_batch(images, steps):
+    """Run ``(name, params)`` steps over a batch, fusing consecutive point-wise steps."""
+    stack = as_stack(images)
+    index = 0
+    while index < len(steps):
+        end = fusable_run(steps, index) if _is_rgb8(stack) else index
+        if end > index:
+            flat = stack.reshape(-1, stack.shape[2], 3)
+            passes = compose([describe_step(*step) for step in steps[index:end]])
+            stack = apply_passes(flat, passes).reshape(stack.shape)
+            index = end
+        else:
+            stack = apply_step_batch(stack, *steps[index])
+            index += 1
+    return stack
@@ -0,0 +1,103 @@
+"""Read-only shared image buffers and per-session memory accounting.
+
+Images kept in session state are read-only arrays owned by the shared caches,
+so sessions hold references instead of copies: the original is the decode
+cache's array, resetting points back at it and crops are views. A session's
+footprint is measured over the distinct buffers its arrays keep alive, so a
+view is charged for the buffer behind it and a buffer shared by several
+views is counted once.
+"""
+import mmap
+import threading
+import time
+
+import numpy as np
+
+import config
+from utils.metrics import METRICS
+
+
+def freeze(array):
+    """Mark ``array`` read-only in place and return it."""
+    if array.flags.writeable:
+        array.flags.writeable = False
+    return array
+
+
+def owner(array):
+    """Return the array that owns the memory behind ``array`` (itself if it is not a view)."""
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def is_mapped(array):
+    """True when ``array`` is backed by a memory-mapped file rather than process memory."""
+    root = owner(array)
+    return isinstance(root, np.memmap) or isinstance(root.base, mmap.mmap)
+
+
+def compact(array, keep=()):
+    """Return ``array``, or a read-only copy if it is a small view pinning a much larger buffer.
+
+    Views into the buffers in ``keep`` are returned as they are, since those
+    stay alive anyway.
+    """
+    root = owner(array)
+    if root is array or any(root is owner(kept) for kept in keep):
+        return array
+    if array.nbytes * config.VIEW_MAX_WASTE >= root.nbytes:
+        return array
+    return freeze(array.copy())
+
+
+def _arrays(value):
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _arrays(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _arrays(item)
+
+
+def memory_usage(values):
+    """Return ``{'resident', 'mapped', 'buffers'}`` for the distinct buffers reachable from ``values``."""
+    roots = {}
+    for array in _arrays(list(values)):
+        root = owner(array)
+        roots[id(root)] = root
+    resident = sum(root.nbytes for root in roots.values() if not is_mapped(root))
+    mapped = sum(root.nbytes for root in roots.values() if is_mapped(root))
+    return {'resident': resident, 'mapped': mapped, 'buffers': len(roots)}
+
+
+class SessionMemory:
+    """Latest memory usage reported by each live session, exported like a cache."""
+
+    def __init__(self, idle_seconds=3600):
+        self.idle_seconds = idle_seconds
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def update(self, session_id, usage):
+        now = time.monotonic()
+        with self._lock:
+            self._usage[session_id] = (now, usage)
+            for key in [key for key, (seen, _) in self._usage.items() if now - seen > self.idle_seconds]:
+                del self._usage[key]
+
+    def stats(self):
+        with self._lock:
+            usages = [usage for _, usage in self._usage.values()]
+        return {
+            'entries': len(usages),
+            'bytes': sum(usage['resident'] for usage in usages),
+            'mapped_bytes': sum(usage['mapped'] for usage in usages),
+            'max_session_bytes': max((usage['resident'] for usage in usages), default=0),
+        }
+
+
+SESSION_MEMORY = SessionMemory()
+METRICS.register_cache('sessions', SESSION_MEMORY)
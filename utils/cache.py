@@ -0,0 +1,261 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def content_hash(data):
+    """Return a short, stable hex digest for a bytes-like object."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def sizeof(value):
+    """Best-effort size in bytes of a cached value (arrays, bytes, tuples of those)."""
+    if value is None:
+        return 0
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(sizeof(item) for item in value)
+    return 0
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key`` and mark it as recently used."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes=None):
+        """Store ``value``, evicting least recently used entries to stay in budget."""
+        size = sizeof(value) if nbytes is None else nbytes
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            self._items[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def pop(self, key, default=None):
+        """Remove ``key`` from the cache and return its value."""
+        with self._lock:
+            if key not in self._items:
+                return default
+            value = self._items[key]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return a snapshot of size and hit/miss counters."""
+        with self._lock:
+            return {
+                'entries': len(self._items),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _remove(self, key):
+        del self._items[key]
+        self.current_bytes -= self._sizes.pop(key)
+
+
+class DiskCache:
+    """Array cache on disk with size-based eviction of the least recently used files.
+
+    Arrays are stored as ``.npy`` files and loaded memory-mapped, or as
+    compressed ``.npz`` files when ``compress`` is set. Several processes may
+    share the directory: writes are atomic renames and eviction rescans it.
+    """
+
+    def __init__(self, directory, max_bytes, compress=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        name = key if isinstance(key, str) and key.isalnum() else content_hash(repr(key).encode())
+        return os.path.join(self.directory, name + ('.npz' if self.compress else '.npy'))
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(('.npy', '.npz')):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if self.compress:
+                with np.load(path) as archive:
+                    value = archive['array']
+                value.flags.writeable = False
+            else:
+                value = np.load(path, mmap_mode='r')
+            # mtime doubles as the access time used for eviction
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Write ``value`` atomically; returns False for values that are not plain arrays."""
+        if not isinstance(value, np.ndarray) or value.dtype == object or value.nbytes > self.max_bytes:
+            return False
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            if self.compress:
+                np.savez_compressed(f, array=value)
+            else:
+                np.save(f, np.ascontiguousarray(value))
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.current_bytes += size
+            over_budget = self.current_bytes > self.max_bytes
+        if over_budget:
+            self._evict()
+        return True
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._scan())
+            total = sum(size for _, _, size in entries)
+            for _, path, size in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+            self.current_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for _, path, _ in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._scan()),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class TieredCache:
+    """Memory LRU in front of a disk cache; disk hits are promoted to memory."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def __contains__(self, key):
+        return key in self.memory or (self.disk is not None and key in self.disk)
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return default if value is None else value
+
+    def put(self, key, value):
+        stored = self.memory.put(key, value)
+        if self.disk is not None:
+            stored = self.disk.put(key, value) or stored
+        return stored
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Combined counters: a hit is a hit in either tier, a miss misses both."""
+        memory = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else {}
+        return {
+            'entries': memory['entries'],
+            'bytes': memory['bytes'],
+            'max_bytes': memory['max_bytes'],
+            'hits': memory['hits'] + disk.get('hits', 0),
+            'misses': disk['misses'] if self.disk is not None else memory['misses'],
+            'evictions': memory['evictions'],
+            'disk_entries': disk.get('entries', 0),
+            'disk_bytes': disk.get('bytes', 0),
+            'disk_evictions': disk.get('evictions', 0),
+        }
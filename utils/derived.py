@@ -0,0 +1,93 @@
+"""Memoised auxiliary data for parameterised steps.
+
+Derived structures (noise fields today) are built once per shape and
+parameters and kept in a byte-bounded LRU shared by every session and worker
+thread, so moving a slider back and forth or processing many same-sized
+images reuses them. Cached arrays are read-only.
+"""
+import cv2
+import numpy as np
+
+import config
+from utils.cache import ByteLRUCache
+from utils.metrics import METRICS
+
+DERIVED_CACHE = ByteLRUCache(config.DERIVED_CACHE_MAX_BYTES)
+METRICS.register_cache('derived', DERIVED_CACHE)
+
+NOISE_TYPES = ('gaussian', 'salt_pepper', 'poisson')
+
+
+def derived(kind, key, build):
+    """Return the cached ``build()`` result for ``(kind, key)``, building it on a miss."""
+    cache_key = (kind,) + tuple(key)
+    value = DERIVED_CACHE.get(cache_key)
+    if value is None:
+        value = build()
+        value.setflags(write=False)
+        DERIVED_CACHE.put(cache_key, value)
+    return value
+
+
+def _rng(shape, seed):
+    # Fields of different shapes are independent even for the same seed
+    return np.random.default_rng([int(seed), *shape])
+
+
+def _gaussian_offsets(shape, intensity, seed):
+    field = _rng(shape, seed).standard_normal(shape, dtype=np.float32) * (intensity * 255)
+    return np.rint(field).astype(np.int16)
+
+
+def _salt_pepper_offsets(shape, intensity, seed):
+    draws = _rng(shape, seed).random(shape[:2], dtype=np.float32)
+    offsets = np.zeros(shape[:2], dtype=np.int16)
+    offsets[draws < intensity / 2] = -255
+    offsets[draws > 1 - intensity / 2] = 255
+    if len(shape) == 3:
+        offsets = np.repeat(offsets[:, :, None], shape[2], axis=2)
+    return offsets
+
+
+def _standard_normal(shape, seed):
+    return _rng(shape, seed).standard_normal(shape, dtype=np.float32)
+
+
+def noise_offsets(shape, noise_type, intensity, seed):
+    """Additive int16 noise field for ``shape``; identical for identical arguments."""
+    if noise_type == 'gaussian':
+        build = lambda: _gaussian_offsets(shape, intensity, seed)
+    elif noise_type == 'salt_pepper':
+        build = lambda: _salt_pepper_offsets(shape, intensity, seed)
+    else:
+        raise ValueError(f"No additive field for noise type: {noise_type}")
+    return derived('noise', (tuple(shape), noise_type, float(intensity), int(seed)), build)
+
+
+def add_noise(image, noise_type='gaussian', intensity=0.1, seed=0):
+    """Add reproducible noise to an integer image, keeping its dtype.
+
+    With ``peak`` the largest value of the dtype (255 for uint8), gaussian
+    noise has a standard deviation of ``intensity * peak``; salt and pepper
+    sets a fraction ``intensity`` of pixels to 0 or ``peak``; poisson noise
+    uses the Gaussian approximation with a deviation of
+    ``intensity * sqrt(peak * value)``, i.e. ``intensity * peak`` at white.
+    """
+    if noise_type not in NOISE_TYPES:
+        raise ValueError(f"Unknown noise type: {noise_type}")
+    if not np.issubdtype(image.dtype, np.integer):
+        raise ValueError(f"Seeded noise needs an integer image, got {image.dtype}")
+    peak = np.iinfo(image.dtype).max
+    if noise_type != 'poisson' and image.dtype == np.uint8:
+        offsets = noise_offsets(image.shape, noise_type, intensity, seed)
+        # Saturating add straight into uint8, without an int16 copy of the image
+        return cv2.add(image, offsets, dtype=cv2.CV_8U)
+    if noise_type == 'salt_pepper':
+        offsets = noise_offsets(image.shape, noise_type, intensity, seed)
+        return np.where(offsets < 0, 0, np.where(offsets > 0, peak, image)).astype(image.dtype)
+    field = derived('normal', (tuple(image.shape), int(seed)), lambda: _standard_normal(image.shape, seed))
+    if noise_type == 'gaussian':
+        noisy = image + field * np.float32(intensity * peak)
+    else:
+        noisy = image + np.sqrt(image * np.float32(peak * intensity ** 2)) * field
+    return np.clip(np.rint(noisy), 0, peak).astype(image.dtype)
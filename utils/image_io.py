@@ -0,0 +1,194 @@
+import io
+import math
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from utils.cache import ByteLRUCache, content_hash
+from utils.metrics import METRICS
+
+
+# Pillow format names that are variants of a format in SUPPORTED_FORMATS
+FORMAT_ALIASES = {
+    'mpo': 'jpeg',
+}
+
+
+def check_format(image):
+    """Raise ValueError unless the opened image's format is in ``config.SUPPORTED_FORMATS``."""
+    name = (image.format or '').lower()
+    if FORMAT_ALIASES.get(name, name) not in config.SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported image format: {image.format or 'unknown'}")
+
+
+def read_size(data):
+    """Return ``(width, height)`` from the image header without decoding pixels."""
+    image = Image.open(io.BytesIO(data))
+    check_format(image)
+    return image.size
+
+
+def reduction_scale(size, max_pixels=None, target_size=None):
+    """Scale (<= 1) at which an image of ``size`` still covers ``target_size`` within ``max_pixels``."""
+    width, height = size
+    scale = 1.0
+    if target_size is not None:
+        scale = min(1.0, max(target_size[0] / width, target_size[1] / height))
+    if max_pixels and width * height * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / (width * height))
+    return scale
+
+
+def _retile(tile, extents, offset=None):
+    # Pillow >= 11 uses a namedtuple for tile descriptors, older versions a tuple
+    offset = tile[2] if offset is None else offset
+    if hasattr(tile, '_replace'):
+        return tile._replace(extents=extents, offset=offset)
+    return (tile[0], extents, offset) + tuple(tile[3:])
+
+
+def _decode_tiff_window(image, box):
+    """Decode only the TIFF tiles/strips that intersect ``box``; returns the window origin.
+
+    Only works when Pillow decodes the raw data itself (uncompressed files);
+    images handed to libtiff as a single tile return None and are decoded
+    normally.
+    """
+    tiles = image.tile
+    left, top, right, bottom = box
+    if len(tiles) == 1 and tiles[0][0] == 'raw' and tuple(tiles[0][1]) == (0, 0) + image.size:
+        # Contiguous strips: skip straight to the first needed row
+        rawmode, stride, orientation = tiles[0][3]
+        if rawmode != image.mode or image.mode not in ('L', 'RGB', 'RGBA') or stride or orientation != 1:
+            return None
+        row_bytes = image.size[0] * len(image.mode)
+        image.tile = [_retile(tiles[0], (0, 0, image.size[0], bottom - top), tiles[0][2] + top * row_bytes)]
+        image._size = (image.size[0], bottom - top)
+        image.load()
+        return 0, top
+    if len(tiles) < 2 or any(tile[0] != 'raw' for tile in tiles):
+        return None
+    selected = [
+        tile for tile in tiles
+        if tile[1][0] < right and tile[1][2] > left and tile[1][1] < bottom and tile[1][3] > top
+    ]
+    window_left = min(tile[1][0] for tile in selected)
+    window_top = min(tile[1][1] for tile in selected)
+    window_right = max(tile[1][2] for tile in selected)
+    window_bottom = max(tile[1][3] for tile in selected)
+    image.tile = [
+        _retile(tile, (tile[1][0] - window_left, tile[1][1] - window_top,
+                       tile[1][2] - window_left, tile[1][3] - window_top))
+        for tile in selected
+    ]
+    image._size = (window_right - window_left, window_bottom - window_top)
+    image.load()
+    return window_left, window_top
+
+
+def _decode_region(data, image, region):
+    width, height = image.size
+    left, top, right, bottom = region
+    box = (max(0, left), max(0, top), min(width, right), min(height, bottom))
+    if image.format == 'TIFF':
+        try:
+            origin = _decode_tiff_window(image, box)
+        except Exception:
+            # Pillow internals differ between versions; fall back to a full decode
+            origin = None
+            image = Image.open(io.BytesIO(data))
+        if origin is not None:
+            x, y = origin
+            return image.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y))
+    return image.crop(box)
+
+
+def decode_image(data, max_pixels=None, target_size=None, region=None):
+    """Decode encoded image bytes into a read-only RGB (or single channel) array.
+
+    The header is inspected first so that only the needed pixels are
+    materialised: ``region`` (left, top, right, bottom) limits decoding to a
+    box, tile by tile for uncompressed TIFFs; ``target_size`` and
+    ``max_pixels`` cap the resolution, using JPEG draft mode to decode at a
+    reduced scale directly.
+    """
+    image = Image.open(io.BytesIO(data))
+    check_format(image)
+    if region is not None:
+        image = _decode_region(data, image, region)
+    scale = reduction_scale(image.size, max_pixels, target_size)
+    wanted = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+    if scale < 1.0 and image.format == 'JPEG' and image.mode in ('RGB', 'L'):
+        # DCT scaling decodes at 1/2, 1/4 or 1/8 size, never smaller than asked
+        image.draft(image.mode, wanted)
+    # asarray wraps the decoded buffer instead of copying it a second time
+    image_array = np.asarray(image)
+    if len(image_array.shape) == 3 and image_array.shape[2] == 4:
+        image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
+    if scale < 1.0 and image_array.shape[1] > wanted[0]:
+        image_array = cv2.resize(image_array, wanted, interpolation=cv2.INTER_AREA)
+    if image_array.flags.writeable:
+        image_array.flags.writeable = False
+    return image_array
+
+
+class DecodeCache:
+    """Content-addressed cache of decoded uploads, shared across sessions."""
+
+    def __init__(self, max_bytes, disk=None):
+        self._cache = ByteLRUCache(max_bytes)
+        self._disk = disk
+
+    def load(self, data, max_pixels=None):
+        """Return ``(key, image)`` for encoded bytes, decoding only on a miss.
+
+        With a disk cache the returned image is memory-mapped from it.
+        """
+        key = content_hash(data)
+        if max_pixels:
+            key = f"{key}@{max_pixels}"
+        image = self._cache.get(key)
+        if image is not None:
+            return key, image
+        if self._disk is not None:
+            image = self._disk.get(key)
+        if image is None:
+            with METRICS.span('decode'):
+                image = decode_image(data, max_pixels=max_pixels)
+            METRICS.inc('bytes_allocated_total', image.nbytes, stage='decode')
+            if self._disk is not None and self._disk.put(key, image):
+                image = self._disk.get(key, image)
+        self._cache.put(key, image)
+        return key, image
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def encode_image(image, format='PNG', **options):
+    """Encode an RGB (or single channel) array to image file bytes."""
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+class EncodeCache:
+    """Cache of encoded image bytes keyed by (image key, format, encoder options)."""
+
+    def __init__(self, max_bytes):
+        self._cache = ByteLRUCache(max_bytes)
+
+    def encode(self, image_key, image, format='PNG', **options):
+        """Return encoded bytes for ``image``, encoding only if this combination is new."""
+        key = (image_key, format, tuple(sorted(options.items())))
+        data = self._cache.get(key)
+        if data is None:
+            with METRICS.span('encode', format=format):
+                data = encode_image(image, format, **options)
+            self._cache.put(key, data)
+        return data
+
+    def stats(self):
+        return self._cache.stats()
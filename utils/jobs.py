@@ -0,0 +1,113 @@
+"""Background job queue shared by all sessions.
+
+Filter renders run on a bounded thread pool instead of the session's script
+thread. Each owner (a session slot) has at most one live job: submitting a
+new one supersedes the old one, which is cancelled unless another owner is
+still waiting on it. Identical in-flight requests are coalesced onto a
+single job.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised when the number of in-flight jobs reached the configured limit."""
+
+
+class Job:
+    """Handle for a submitted job: progress, cancellation and result."""
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.owners = set()
+        self.completed_steps = 0
+        self.total_steps = 0
+        self.finished = False
+        self._cancel_event = threading.Event()
+
+    @property
+    def progress(self):
+        if not self.total_steps:
+            return 0.0
+        return min(1.0, self.completed_steps / self.total_steps)
+
+    def report(self, completed, total):
+        self.completed_steps = completed
+        self.total_steps = total
+
+    def cancel(self):
+        """Cancel the job if queued, otherwise ask it to stop at its next checkpoint."""
+        self._cancel_event.set()
+        self.future.cancel()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobQueue:
+    """Bounded worker pool with per-owner supersession and request coalescing."""
+
+    def __init__(self, max_workers, max_pending):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='filter-job')
+        # Re-entrant: a job that finishes immediately runs its done callback
+        # while submit() still holds the lock
+        self._lock = threading.RLock()
+        self._in_flight = {}
+        self._by_owner = {}
+
+    def submit(self, owner, key, func):
+        """Run ``func(report, is_cancelled)`` for ``owner``, reusing an identical in-flight job."""
+        with self._lock:
+            job = self._in_flight.get(key)
+            # A cancelled job may still be running until its next checkpoint,
+            # but it will not produce a result, so start a fresh one
+            if job is None or job.is_cancelled():
+                if job is None and len(self._in_flight) >= self.max_pending:
+                    raise QueueFull(f"{len(self._in_flight)} jobs already in flight")
+                job = Job(key)
+                job.future = self._executor.submit(func, job.report, job.is_cancelled)
+                self._in_flight[key] = job
+                job.future.add_done_callback(lambda _, job=job: self._finished(job))
+            self._release(owner, keep=job)
+            # A job that already finished is not tracked any more
+            if not job.finished:
+                job.owners.add(owner)
+                self._by_owner[owner] = job
+            return job
+
+    def release(self, owner):
+        """Forget ``owner``'s job, cancelling it if nobody else is waiting for it."""
+        with self._lock:
+            self._release(owner)
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._in_flight), 'owners': len(self._by_owner)}
+
+    def _release(self, owner, keep=None):
+        previous = self._by_owner.pop(owner, None)
+        if previous is None or previous is keep:
+            return
+        previous.owners.discard(owner)
+        if not previous.owners and not previous.done():
+            previous.cancel()
+
+    def _finished(self, job):
+        with self._lock:
+            job.finished = True
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            # Owners collect the result through their Job handle; the queue
+            # must not keep finished results alive
+            for owner in job.owners:
+                if self._by_owner.get(owner) is job:
+                    del self._by_owner[owner]
+            job.owners.clear()
@@ -0,0 +1,148 @@
+"""Fused lookup-table engine for point-wise filter steps.
+
+A point-wise step is described as an ``(matrix, lut)`` pair: an optional 3x4
+colour matrix (applied with ``cv2.transform``) followed by a per-channel
+256-entry LUT. Descriptions are derived by probing the filter itself, so they
+always follow whatever ``ImageFilters`` does, and are only accepted after
+being checked against the real filter on a random sample. Consecutive steps
+are composed so a run of adjustments costs one pass and one output buffer.
+"""
+import json
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from utils.recipes import apply_step
+from utils.tiling import run_step
+
+# Steps that may be point-wise; anything else always runs through apply_step
+POINTWISE_CANDIDATES = ('brightness_contrast', 'color_balance', 'invert', 'sepia', 'grayscale')
+
+# Largest per-pixel difference accepted between the fitted colour matrix and
+# the real filter (float->uint8 rounding differs between implementations)
+MATRIX_TOLERANCE = 1
+
+_IDENTITY_LUT = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+
+
+def _probe_samples():
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8) for _ in range(2)]
+
+
+def _max_difference(a, b):
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def _probe_lut(name, params, samples):
+    ramp = np.ascontiguousarray(_IDENTITY_LUT[None, :, :])
+    output = apply_step(ramp, name, params)
+    if output.shape != ramp.shape or output.dtype != np.uint8:
+        return None
+    lut = np.ascontiguousarray(output[0])
+    for sample in samples:
+        expected = apply_step(sample, name, params)
+        if expected.shape != sample.shape or not np.array_equal(apply_lut(sample, lut), expected):
+            return None
+    return lut
+
+
+def _probe_matrix(name, params, samples):
+    fit_sample, check_sample = samples
+    output = apply_step(fit_sample, name, params)
+    if output.shape != fit_sample.shape or output.dtype != np.uint8:
+        return None
+    inputs = fit_sample.reshape(-1, 3).astype(np.float64)
+    outputs = output.reshape(-1, 3).astype(np.float64)
+    # Fit only on pixels that were not clipped by the filter
+    unclipped = np.all((outputs > 0) & (outputs < 255), axis=1)
+    if unclipped.sum() < 64:
+        return None
+    design = np.hstack([inputs[unclipped], np.ones((int(unclipped.sum()), 1))])
+    solution, *_ = np.linalg.lstsq(design, outputs[unclipped], rcond=None)
+    matrix = solution.T.astype(np.float32)
+    for sample in samples:
+        expected = apply_step(sample, name, params) if sample is check_sample else output
+        if _max_difference(cv2.transform(sample, matrix), expected) > MATRIX_TOLERANCE:
+            return None
+    return matrix
+
+
+@lru_cache(maxsize=256)
+def _describe(name, params_json):
+    params = json.loads(params_json)
+    samples = _probe_samples()
+    lut = _probe_lut(name, params, samples)
+    if lut is not None:
+        return None, lut
+    matrix = _probe_matrix(name, params, samples)
+    if matrix is not None:
+        return matrix, _IDENTITY_LUT
+    return None
+
+
+def describe_step(name, params=None):
+    """Return the ``(matrix, lut)`` description of a step, or None if it is not point-wise."""
+    if name not in POINTWISE_CANDIDATES:
+        return None
+    return _describe(name, json.dumps(params or {}, sort_keys=True))
+
+
+def can_fuse(image):
+    """The fused path covers 8-bit, 3-channel images."""
+    return image.dtype == np.uint8 and image.ndim == 3 and image.shape[2] == 3
+
+
+def compose(operations):
+    """Merge a sequence of ``(matrix, lut)`` operations into as few passes as possible."""
+    passes = []
+    for matrix, lut in operations:
+        if matrix is None and passes:
+            previous_matrix, previous_lut = passes[-1]
+            # L2(L1(x)) per channel: index the later table with the earlier one
+            passes[-1] = (previous_matrix, np.take_along_axis(lut, previous_lut.astype(np.intp), axis=0))
+        else:
+            passes.append((matrix, lut))
+    return passes
+
+
+def apply_lut(image, lut, out=None):
+    """Apply a (256, 3) per-channel LUT in a single ``cv2.LUT`` pass."""
+    return cv2.LUT(image, lut.reshape(1, 256, 3), dst=out)
+
+
+def apply_passes(image, passes):
+    """Run composed passes; only the first pass allocates, later ones work in place."""
+    result = image
+    for matrix, lut in passes:
+        if matrix is not None:
+            result = cv2.transform(result, matrix)
+            if lut is not _IDENTITY_LUT:
+                apply_lut(result, lut, out=result)
+        else:
+            out = result if result is not image else None
+            result = apply_lut(result, lut, out=out)
+    return result
+
+
+def fusable_run(steps, start):
+    """Return the end index of the run of point-wise steps beginning at ``start``."""
+    end = start
+    while end < len(steps) and describe_step(*steps[end]) is not None:
+        end += 1
+    return end
+
+
+def apply_steps(image, steps):
+    """Apply ``(name, params)`` steps, fusing consecutive point-wise steps into single passes."""
+    index = 0
+    while index < len(steps):
+        end = fusable_run(steps, index) if can_fuse(image) else index
+        if end > index:
+            image = apply_passes(image, compose([describe_step(*step) for step in steps[index:end]]))
+            index = end
+        else:
+            image = run_step(image, *steps[index])
+            index += 1
+    return image
@@ -0,0 +1,137 @@
+"""Process-wide timing spans, counters and a Prometheus-style text export.
+
+Spans keep a bounded window of recent durations per series, from which
+p50/p95 latencies are computed. Caches register themselves so their hit and
+miss counts show up in the same export.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'imagefilter'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+
+def _quantile(sorted_samples, q):
+    index = min(len(sorted_samples) - 1, max(0, int(round(q * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+
+class Metrics:
+    """Thread-safe registry of latency samples, counters and cache statistics."""
+
+    def __init__(self, window=2048):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(float)
+        self._caches = {}
+        self._last_log = time.monotonic()
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time the enclosed block as one sample of ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def observe(self, stage, seconds, **labels):
+        key = (stage, _label_key(labels))
+        with self._lock:
+            self._samples[key].append(seconds)
+            total = self._totals[key]
+            total[0] += 1
+            total[1] += seconds
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def register_cache(self, name, cache):
+        """Include ``cache.stats()`` in exports under ``cache=name``."""
+        with self._lock:
+            self._caches[name] = cache
+
+    def latency_summary(self):
+        """Return one row per series with count, p50 and p95 in milliseconds."""
+        with self._lock:
+            series = [(key, sorted(samples), list(self._totals[key])) for key, samples in self._samples.items()]
+        rows = []
+        for (stage, labels), samples, (count, _) in sorted(series):
+            if not samples:
+                continue
+            rows.append({
+                'stage': stage,
+                **dict(labels),
+                'count': count,
+                'p50_ms': _quantile(samples, 0.5) * 1000,
+                'p95_ms': _quantile(samples, 0.95) * 1000,
+            })
+        return rows
+
+    def cache_stats(self):
+        with self._lock:
+            caches = dict(self._caches)
+        return {name: cache.stats() for name, cache in caches.items()}
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [
+            f'# HELP {METRIC_PREFIX}_stage_seconds Time spent per processing stage.',
+            f'# TYPE {METRIC_PREFIX}_stage_seconds summary',
+        ]
+        with self._lock:
+            series = [(key, sorted(samples), list(self._totals[key])) for key, samples in self._samples.items()]
+            counters = dict(self._counters)
+        for (stage, labels), samples, (count, total) in sorted(series):
+            labels = (('stage', stage),) + labels
+            for q in (0.5, 0.95):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{_format_labels(labels, quantile=q)} {_quantile(samples, q):.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{_format_labels(labels)} {count}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{_format_labels(labels)} {total:.6f}')
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} counter')
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f'{METRIC_PREFIX}_{name}{_format_labels(labels)} {value:g}')
+        cache_stats = self.cache_stats()
+        for field in ('hits', 'misses', 'evictions', 'bytes', 'entries'):
+            kind = 'gauge' if field in ('bytes', 'entries') else 'counter'
+            suffix = '' if kind == 'gauge' else '_total'
+            lines.append(f'# TYPE {METRIC_PREFIX}_cache_{field}{suffix} {kind}')
+            for name, stats in sorted(cache_stats.items()):
+                lines.append(f'{METRIC_PREFIX}_cache_{field}{suffix}{{cache="{name}"}} {stats.get(field, 0)}')
+        return '\n'.join(lines) + '\n'
+
+    def maybe_log(self, interval):
+        """Log a one-line p50/p95 summary at most once per ``interval`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < interval:
+                return
+            self._last_log = now
+        parts = []
+        for row in self.latency_summary():
+            name = row['stage'] + (f"[{row['filter']}]" if 'filter' in row else '')
+            parts.append(f"{name} n={row['count']} p50={row['p50_ms']:.1f}ms p95={row['p95_ms']:.1f}ms")
+        if parts:
+            logger.info("latency %s", '; '.join(parts))
+
+
+METRICS = Metrics()
@@ -0,0 +1,125 @@
+"""Multi-core execution of a single step by splitting the image into row bands.
+
+Bands run on a shared thread pool; OpenCV and NumPy release the GIL inside
+their kernels, so band-safe steps scale across cores. A step is band-safe
+when ``recipes.tile_halo`` knows its footprint; each band is padded by that
+halo and only its core rows are written back. Halos are checked once per
+step, parameters and pixel layout (``verified_halo``) before anything is split.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from utils.recipes import apply_step, tile_halo
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_worker_limit = None
+
+# (name, params, dtype, channel shape) -> whether split processing matched the whole image
+_halo_verdicts = {}
+
+
+def worker_count():
+    return _worker_limit or config.PARALLEL_WORKERS or os.cpu_count() or 1
+
+
+def init_pool_worker():
+    """Process-pool initializer: filter bands on one thread, the pool already uses every core."""
+    global _worker_limit
+    _worker_limit = 1
+
+
+def get_executor():
+    """Thread pool shared by every caller in this process."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=worker_count(), thread_name_prefix='filter-band')
+        return _executor
+
+
+def _halo_holds(name, params, halo, dtype, channels):
+    # Split a sample into 2 x 2 halo-padded tiles, which covers both row bands
+    # and tiles, and compare the stitched cores with the whole-image result
+    side = 2 * (halo + 32)
+    rng = np.random.default_rng(0)
+    if np.issubdtype(dtype, np.integer):
+        sample = rng.integers(0, np.iinfo(dtype).max, size=(side, side) + channels, endpoint=True, dtype=dtype)
+    else:
+        sample = rng.random((side, side) + channels).astype(dtype)
+    try:
+        expected = apply_step(sample, name, params)
+        for y0, y1 in ((0, side // 2), (side // 2, side)):
+            for x0, x1 in ((0, side // 2), (side // 2, side)):
+                py0, px0 = max(0, y0 - halo), max(0, x0 - halo)
+                result = apply_step(sample[py0:y1 + halo, px0:x1 + halo], name, params)
+                core = result[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+                if not np.array_equal(core, expected[y0:y1, x0:x1]):
+                    return False
+    except Exception:
+        # Size-changing or failing steps are left to run on the whole image
+        return False
+    return True
+
+
+def verified_halo(name, params, image):
+    """Return the step's halo if split processing reproduces the whole image for this layout, else None."""
+    halo = tile_halo(name, params)
+    if halo is None:
+        return None
+    key = (name, json.dumps(params or {}, sort_keys=True), image.dtype.str, image.shape[2:])
+    if key not in _halo_verdicts:
+        _halo_verdicts[key] = _halo_holds(name, params or {}, halo, image.dtype, image.shape[2:])
+        if not _halo_verdicts[key]:
+            logger.warning("halo %d of %s does not reproduce the whole-image result; not splitting it", halo, name)
+    return halo if _halo_verdicts[key] else None
+
+
+def iter_bands(height, bands, halo=0):
+    """Yield ``((y0, y1), (py0, py1))`` row ranges; the padded range includes the halo."""
+    band_height = -(-height // bands)
+    for y0 in range(0, height, band_height):
+        y1 = min(y0 + band_height, height)
+        yield (y0, y1), (max(0, y0 - halo), min(height, y1 + halo))
+
+
+def apply_banded(image, name, params=None, halo=0, bands=None):
+    """Run a band-safe step on row bands in parallel and merge the results."""
+    params = params or {}
+    height = image.shape[0]
+    bands = bands or worker_count()
+    ranges = list(iter_bands(height, bands, halo))
+    futures = [
+        get_executor().submit(apply_step, image[py0:py1], name, params)
+        for _, (py0, py1) in ranges
+    ]
+    output = None
+    for ((y0, y1), (py0, py1)), future in zip(ranges, futures):
+        result = future.result()
+        if result.shape[:2] != (py1 - py0, image.shape[1]):
+            raise ValueError(f"Step {name!r} changes the image size and cannot run in bands")
+        if output is None:
+            output = np.empty((height,) + result.shape[1:], dtype=result.dtype)
+        output[y0:y1] = result[y0 - py0:y1 - py0]
+    return output
+
+
+def run_parallel(image, name, params=None):
+    """Run a step on all cores when it is band-safe and the image is large enough to benefit."""
+    halo = tile_halo(name, params)
+    workers = worker_count()
+    if halo is None or workers < 2 or image.shape[0] * image.shape[1] < config.PARALLEL_MIN_PIXELS:
+        return apply_step(image, name, params)
+    # Halo overhead grows with the number of bands; keep bands well above it
+    bands = min(workers, max(1, image.shape[0] // max(4 * halo, 32)))
+    if bands < 2 or verified_halo(name, params, image) is None:
+        return apply_step(image, name, params)
+    return apply_banded(image, name, params, halo=halo, bands=bands)
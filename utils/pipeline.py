@@ -0,0 +1,107 @@
+import hashlib
+import json
+
+from utils.buffers import compact, freeze
+from utils.lut import apply_passes, can_fuse, compose, describe_step, fusable_run
+from utils.metrics import METRICS
+from utils.recipes import output_size, scale_params
+from utils.tiling import run_step
+
+
+def stage_key(input_key, name, params):
+    """Cache key for the output of one step applied to the input identified by ``input_key``."""
+    payload = json.dumps([input_key, name, params], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class PipelineCancelled(Exception):
+    """Raised by ``Pipeline.run`` when its ``cancelled`` callback returns True."""
+
+
+class Pipeline:
+    """Ordered list of filter steps whose per-stage results are cached.
+
+    Each stage is keyed by the key of its input and its own parameters, so
+    editing step k leaves the cached outputs of steps 0..k-1 valid and only
+    k..n are recomputed.
+    """
+
+    def __init__(self, steps=None):
+        self.steps = list(steps or [])
+
+    def __len__(self):
+        return len(self.steps)
+
+    def append(self, name, params=None, label=None):
+        self.steps.append({'name': name, 'params': dict(params or {}), 'label': label or name})
+
+    def replace(self, index, name, params=None, label=None):
+        self.steps[index] = {'name': name, 'params': dict(params or {}), 'label': label or name}
+
+    def remove(self, index):
+        del self.steps[index]
+
+    def clear(self):
+        self.steps.clear()
+
+    def labels(self):
+        return [step['label'] for step in self.steps]
+
+    def output_size(self, shape, upto=None):
+        """Return the shape after the first ``upto`` steps (all by default) for an input of ``shape``."""
+        for step in self.steps[:upto]:
+            shape = output_size(step['name'], step['params'], shape)
+        return shape
+
+    def scaled_steps(self, scale=1.0):
+        """Return ``(name, params)`` pairs with pixel parameters adjusted for ``scale``."""
+        return [(step['name'], scale_params(step['name'], step['params'], scale)) for step in self.steps]
+
+    def stage_keys(self, input_key, scale=1.0):
+        """Return the chained cache key of every stage for the given input."""
+        keys = []
+        key = input_key
+        for name, params in self.scaled_steps(scale):
+            key = stage_key(key, name, params)
+            keys.append(key)
+        return keys
+
+    def run(self, image, input_key, cache, scale=1.0, progress=None, cancelled=None):
+        """Return ``(result, result_key)``, resuming from the deepest cached stage.
+
+        ``progress(completed, total)`` is called after every stage, and
+        ``cancelled()`` is checked before each one so a superseded run stops
+        early; stages finished so far stay cached.
+        """
+        steps = self.scaled_steps(scale)
+        keys = self.stage_keys(input_key, scale)
+        result, start = image, 0
+        for index in range(len(keys) - 1, -1, -1):
+            cached = cache.get(keys[index])
+            if cached is not None:
+                result, start = cached, index + 1
+                break
+        index = start
+        while index < len(steps):
+            if cancelled is not None and cancelled():
+                raise PipelineCancelled()
+            # Consecutive point-wise steps run as one fused LUT pass; only the
+            # output of the last step in the run is cached
+            end = fusable_run(steps, index) if can_fuse(result) else index
+            if end > index:
+                with METRICS.span('filter', filter='+'.join(name for name, _ in steps[index:end])):
+                    result = apply_passes(result, compose([describe_step(*step) for step in steps[index:end]]))
+                index = end
+            else:
+                with METRICS.span('filter', filter=steps[index][0]):
+                    result = run_step(result, *steps[index])
+                index += 1
+            METRICS.inc('bytes_allocated_total', result.nbytes, stage='filter')
+            # Stage outputs are shared through the cache, so nobody may mutate
+            # them; crops of the input stay views, crops of an intermediate are
+            # copied so they do not pin the whole intermediate
+            result = freeze(compact(result, keep=(image,)))
+            cache.put(keys[index - 1], result)
+            if progress is not None:
+                progress(index, len(steps))
+        return result, keys[-1] if keys else input_key
@@ -0,0 +1,63 @@
+import cv2
+
+from utils.cache import ByteLRUCache
+from utils.image_io import encode_image
+from utils.metrics import METRICS
+
+
+def build_pyramid(image, min_width):
+    """Return ``image`` followed by successively halved copies no narrower than ``min_width``."""
+    levels = [image]
+    while levels[-1].shape[1] // 2 >= min_width:
+        previous = levels[-1]
+        level = cv2.resize(
+            previous,
+            (previous.shape[1] // 2, previous.shape[0] // 2),
+            interpolation=cv2.INTER_AREA,
+        )
+        level.flags.writeable = False
+        levels.append(level)
+    return levels
+
+
+def select_level(pyramid, display_width):
+    """Return the smallest pyramid level that is still at least ``display_width`` wide."""
+    for level in reversed(pyramid):
+        if level.shape[1] >= display_width:
+            return level
+    return pyramid[0]
+
+
+def fit_width(image, max_width):
+    """Downscale ``image`` to at most ``max_width`` pixels wide, keeping the aspect ratio."""
+    height, width = image.shape[:2]
+    if width <= max_width:
+        return image
+    return cv2.resize(image, (max_width, max(1, round(height * max_width / width))), interpolation=cv2.INTER_AREA)
+
+
+class PreviewService:
+    """Display-sized, pre-encoded previews cached by image key and source size."""
+
+    def __init__(self, max_bytes, max_width, format='JPEG', quality=85):
+        self.max_width = max_width
+        self.format = format
+        self.quality = quality
+        self._cache = ByteLRUCache(max_bytes)
+
+    def get(self, image_key, image):
+        """Return encoded preview bytes for ``image``, producing them once per key and size.
+
+        The same image is shown from different pyramid levels (preview mode on
+        or off), so the key includes the size of the array being shown.
+        """
+        key = (image_key, image.shape)
+        data = self._cache.get(key)
+        if data is None:
+            with METRICS.span('preview_encode'):
+                data = encode_image(fit_width(image, self.max_width), self.format, quality=self.quality)
+            self._cache.put(key, data)
+        return data
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,233 @@
+import json
+
+from utils.derived import add_noise
+from utils.startup import lazy_import
+
+# The filter module (and whatever it imports) loads on the first filter call,
+# so recipes can be parsed and planned without it
+filters = lazy_import('utils.filters')
+
+
+# --- Step implementations ---
+# Each step takes the input image plus keyword parameters, so a recipe can be
+# stored as plain (name, params) pairs and replayed at any resolution.
+
+def _crop(image, left, top, right, bottom):
+    return image[top:bottom, left:right]
+
+
+def _resize(image, scale=None, width=None, height=None):
+    if scale is not None:
+        return filters.ImageFilters.apply_resize(image, scale=scale)
+    return filters.ImageFilters.apply_resize(image, width=width, height=height)
+
+
+def _noise(image, noise_type='gaussian', intensity=0.1, seed=None):
+    # Seeded noise is reproducible and its field is cached per shape
+    if seed is None:
+        return filters.ImageFilters.apply_noise(image, noise_type, intensity)
+    return add_noise(image, noise_type, intensity, seed)
+
+
+FILTERS = {
+    'grayscale': lambda image: filters.ImageFilters.apply_grayscale(image),
+    'sepia': lambda image: filters.ImageFilters.apply_sepia(image),
+    'blur': lambda image, kernel_size=15: filters.ImageFilters.apply_blur(image, kernel_size),
+    'sharpen': lambda image: filters.ImageFilters.apply_sharpen(image),
+    'edge_detection': lambda image: filters.ImageFilters.apply_edge_detection(image),
+    'invert': lambda image: filters.ImageFilters.apply_invert(image),
+    'cartoon': lambda image: filters.ImageFilters.apply_cartoon(image),
+    'vintage': lambda image: filters.ImageFilters.apply_vintage(image),
+    'emboss': lambda image: filters.ImageFilters.apply_emboss(image),
+    'pencil_sketch': lambda image: filters.ImageFilters.apply_pencil_sketch(image),
+    'hdr': lambda image: filters.ImageFilters.apply_hdr(image),
+    'color_splash': lambda image: filters.ImageFilters.apply_color_splash(image),
+    'brightness_contrast': lambda image, brightness=0, contrast=0: filters.ImageFilters.apply_brightness_contrast(
+        image, brightness, contrast
+    ),
+    'color_balance': lambda image, red=0, green=0, blue=0: filters.ImageFilters.apply_color_balance(
+        image, red, green, blue
+    ),
+    'histogram_equalization': lambda image: filters.ImageFilters.apply_histogram_equalization(image),
+    'rotate': lambda image, angle=0: filters.ImageFilters.apply_rotate(image, angle),
+    'mirror': lambda image, direction='horizontal': filters.ImageFilters.apply_mirror(image, direction),
+    'resize': _resize,
+    'noise': _noise,
+    'crop': _crop,
+}
+
+
+# --- Resolution scaling ---
+# Parameters measured in pixels have to follow the image when a step is run on
+# a downscaled proxy; everything else (angles, intensities) is scale-free.
+
+def _scale_odd(value, factor):
+    scaled = int(round(value * factor))
+    return max(1, scaled if scaled % 2 == 1 else scaled + 1)
+
+
+def _scale_blur(params, factor):
+    return {**params, 'kernel_size': _scale_odd(params.get('kernel_size', 15), factor)}
+
+
+def _scale_crop(params, factor):
+    return {key: int(round(value * factor)) for key, value in params.items()}
+
+
+def _scale_resize(params, factor):
+    if params.get('scale') is not None:
+        return dict(params)
+    return {
+        **params,
+        'width': max(1, int(round(params['width'] * factor))),
+        'height': max(1, int(round(params['height'] * factor))),
+    }
+
+
+PIXEL_PARAM_SCALERS = {
+    'blur': _scale_blur,
+    'crop': _scale_crop,
+    'resize': _scale_resize,
+}
+
+
+def apply_step(image, name, params=None):
+    """Run a single named recipe step on ``image``."""
+    if name not in FILTERS:
+        raise ValueError(f"Unknown filter: {name}")
+    return FILTERS[name](image, **(params or {}))
+
+
+def scale_params(name, params, factor):
+    """Rescale pixel-valued parameters of a step for an image ``factor`` times the original size."""
+    params = params or {}
+    if factor == 1.0 or name not in PIXEL_PARAM_SCALERS:
+        return dict(params)
+    return PIXEL_PARAM_SCALERS[name](params, factor)
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_recipe(text):
+    """Parse a recipe into a list of ``(name, params)`` steps.
+
+    Accepts a JSON list (``[{"name": "blur", "params": {"kernel_size": 15}}]``)
+    or the short form ``blur:kernel_size=15;sepia``.
+    """
+    text = text.strip()
+    if text.startswith('['):
+        steps = []
+        for step in json.loads(text):
+            if not isinstance(step, dict) or not isinstance(step.get('name'), str):
+                raise ValueError(f"Each step must be an object with a name, got {step!r}")
+            params = step.get('params', {})
+            if not isinstance(params, dict):
+                raise ValueError(f"Parameters of {step['name']} must be an object")
+            steps.append((step['name'], dict(params)))
+    else:
+        steps = []
+        for chunk in filter(None, (part.strip() for part in text.split(';'))):
+            name, _, arguments = chunk.partition(':')
+            params = {}
+            for argument in filter(None, (part.strip() for part in arguments.split(','))):
+                key, _, value = argument.partition('=')
+                params[key.strip()] = _parse_value(value.strip())
+            steps.append((name.strip(), params))
+    for name, _ in steps:
+        if name not in FILTERS:
+            raise ValueError(f"Unknown filter: {name}")
+    return steps
+
+
+def apply_recipe(image, steps):
+    """Run every ``(name, params)`` step of a recipe in order."""
+    # Imported here because the LUT engine probes filters through this module
+    from utils.lut import apply_steps
+    return apply_steps(image, steps)
+
+
+# --- Tiling metadata ---
+# Pixels of context a step needs around each output pixel when the image is
+# processed in tiles. Steps missing here depend on the whole frame (geometry,
+# vignette, colour masks, edge hysteresis, noise fields) and are always run on
+# the full image. The artistic effects use estimates of their kernel footprints;
+# parallel.verified_halo checks every halo on a sample before it is relied on.
+TILE_HALO = {
+    'grayscale': 0,
+    'sepia': 0,
+    'invert': 0,
+    'brightness_contrast': 0,
+    'color_balance': 0,
+    'sharpen': 1,
+    'emboss': 1,
+    'cartoon': 16,
+    'pencil_sketch': 16,
+    'hdr': 64,
+}
+
+# Steps whose output depends on statistics of the whole image; they are tiled
+# with a two-pass strategy (gather statistics, then apply)
+GLOBAL_STEPS = ('histogram_equalization',)
+
+
+def tile_halo(name, params=None):
+    """Return the halo a step needs in tiled mode, or None if it cannot be tiled."""
+    if name == 'blur':
+        return (params or {}).get('kernel_size', 15) // 2 + 1
+    return TILE_HALO.get(name)
+
+
+# --- Geometry ---
+# Output size of each step, so controls for a later step (crop bounds, resize
+# defaults) can follow earlier size-changing steps without rendering them
+
+# Steps that keep the image size even though they cannot be tiled
+SIZE_PRESERVING = ('edge_detection', 'vintage', 'color_splash', 'mirror', 'noise')
+
+# Longest side of the blank image other steps (rotation, scaled resize) are
+# probed on; the probed size is scaled back to the real image
+PROBE_SIDE = 256
+
+_probed_sizes = {}
+
+
+def output_size(name, params, shape):
+    """Return the shape a step produces from an image of ``shape``.
+
+    ``shape`` is ``(height, width)`` or ``(height, width, channels)``; only the
+    height and width change.
+    """
+    params = params or {}
+    height, width = shape[:2]
+    if name == 'crop':
+        top, bottom = max(0, params['top']), min(height, params['bottom'])
+        left, right = max(0, params['left']), min(width, params['right'])
+        size = max(0, bottom - top), max(0, right - left)
+    elif name == 'resize' and params.get('scale') is None:
+        size = params['height'], params['width']
+    elif tile_halo(name, params) is not None or name in GLOBAL_STEPS or name in SIZE_PRESERVING:
+        # Tiling and banding rely on these keeping the image size
+        return tuple(shape)
+    else:
+        size = _probe_size(name, params, tuple(shape))
+    return tuple(size) + tuple(shape[2:])
+
+
+def _probe_size(name, params, shape):
+    # Run the step once on a small blank proxy of the same aspect ratio and
+    # channels; probing at full size would cost a full render on the caller
+    height, width = shape[:2]
+    factor = min(1.0, PROBE_SIDE / max(height, width, 1))
+    proxy = (max(1, int(round(height * factor))), max(1, int(round(width * factor)))) + shape[2:]
+    key = (name, json.dumps(params, sort_keys=True), proxy)
+    if key not in _probed_sizes:
+        import numpy as np
+        probed = apply_step(np.zeros(proxy, dtype=np.uint8), name, scale_params(name, params, factor))
+        _probed_sizes[key] = probed.shape[:2]
+    probed_height, probed_width = _probed_sizes[key]
+    return int(round(probed_height / factor)), int(round(probed_width / factor))
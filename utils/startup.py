@@ -0,0 +1,93 @@
+"""Deferred imports and process warm-up for fast cold starts.
+
+Modules behind the image editor (OpenCV, the filters, the caches) are bound
+as ``LazyModule`` proxies, so the login page renders without importing them;
+they load on the first attribute access, and the time that took is recorded
+as an ``import`` span. ``warm_up`` loads everything up front and runs each
+filter once on a small image so its probes (LUT fits, tiling checks) are
+memoised before the first user needs them.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# One proxy per module name: Streamlit re-executes app.py on every rerun
+LAZY_MODULES = {}
+_registry_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import the module now (once) and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    if self._name in sys.modules:
+                        self._module = sys.modules[self._name]
+                    else:
+                        # Only a real import is worth a span
+                        with METRICS.span('import', module=self._name):
+                            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """Return the proxy for module ``name`` that imports it on first use."""
+    with _registry_lock:
+        if name not in LAZY_MODULES:
+            LAZY_MODULES[name] = LazyModule(name)
+        return LAZY_MODULES[name]
+
+
+def warm_up():
+    """Import every lazy module and run each filter once on a small sample image."""
+    start = time.perf_counter()
+    for module in list(LAZY_MODULES.values()):
+        module.load()
+    import numpy as np
+    from utils.recipes import FILTERS
+    from utils.lut import apply_steps, describe_step
+    sample = np.random.default_rng(0).integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    for name in FILTERS:
+        try:
+            describe_step(name, {})
+            apply_steps(sample, [(name, {})])
+        except Exception as e:
+            # Steps with required parameters (crop, resize) cannot run bare
+            logger.debug("warm-up skipped %s: %s", name, e)
+    logger.info("warm-up finished in %.2fs", time.perf_counter() - start)
+
+
+def warm_up_in_background():
+    """Run ``warm_up`` on a daemon thread so it never delays a page.
+
+    Streamlit only executes the app script for a page view (its health
+    endpoint does not), so the app calls this from its first script run.
+    """
+    thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+    thread.start()
+    return thread
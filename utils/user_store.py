@@ -0,0 +1,211 @@
+"""User accounts backed by an embedded, indexed database.
+
+Passwords are stored as salted scrypt hashes. Hashing is deliberately slow,
+so it runs on a small shared thread pool that caps how much CPU concurrent
+logins and signups can take from image processing; a caller that cannot get
+a hashing thread in time gets ``StoreBusy`` instead of a hung page. The
+one-time import of ``users.json`` runs in the background and hashes on every
+core.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCRYPT_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1}
+
+# Longest a login or signup waits for a hashing thread (or for the legacy
+# import to finish) before it is told to retry
+HASH_WAIT_SECONDS = 10
+
+# Demo accounts created when there is no existing user data at all
+DEFAULT_USERS = {
+    'admin': 'admin123',
+    'user': 'user123'
+}
+
+_hash_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='password-hash')
+
+
+class StoreBusy(Exception):
+    """Raised when password hashing cannot start within ``HASH_WAIT_SECONDS``."""
+
+
+def _hash_in_pool(function, *args):
+    # scrypt holds no GIL but is CPU-bound; a queued request is dropped
+    # rather than left to run after its caller gave up
+    future = _hash_executor.submit(function, *args)
+    try:
+        return future.result(timeout=HASH_WAIT_SECONDS)
+    except FutureTimeout:
+        future.cancel()
+        raise StoreBusy("Password hashing is busy, try again shortly") from None
+
+
+def hash_password(password):
+    """Return a self-describing salted scrypt hash of ``password``."""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, **SCRYPT_PARAMS)
+    params = SCRYPT_PARAMS
+    return f"scrypt${params['n']}${params['r']}${params['p']}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password, stored_hash):
+    """Constant-time check of ``password`` against a hash from ``hash_password``."""
+    try:
+        _, n, r, p, salt, digest = stored_hash.split('$')
+    except (AttributeError, ValueError):
+        return False
+    candidate = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+class UserStore:
+    """Interface every user store backend implements.
+
+    Any method may raise ``StoreBusy`` when it cannot answer in time.
+    """
+
+    def get_user(self, username):
+        """Return ``{'username', 'email', 'created_at'}`` or None."""
+        raise NotImplementedError
+
+    def find_by_email(self, email):
+        raise NotImplementedError
+
+    def add_user(self, username, password, email=None):
+        """Create a user atomically; returns False if the username is taken."""
+        raise NotImplementedError
+
+    def verify_password(self, username, password):
+        raise NotImplementedError
+
+
+class SQLiteUserStore(UserStore):
+    """SQLite user store with indexed lookups by username and email.
+
+    One connection is shared by all sessions in the process (callers cache
+    the store), guarded by a lock; WAL mode lets other processes read while
+    a signup is being written.
+    """
+
+    def __init__(self, path, legacy_json_path=None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " username TEXT PRIMARY KEY,"
+                " email TEXT,"
+                " password_hash TEXT NOT NULL,"
+                " created_at TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS users_email ON users (email)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Importing thousands of legacy users takes a while; the store is
+        # usable (lookups wait on this) without blocking whoever created it
+        self._migrated = threading.Event()
+        threading.Thread(target=self._migrate_in_background, args=(legacy_json_path,),
+                         name='user-migration', daemon=True).start()
+
+    def _migrate_in_background(self, legacy_json_path):
+        try:
+            self._migrate(legacy_json_path)
+        except Exception:
+            logger.exception("importing legacy users from %s failed", legacy_json_path)
+        finally:
+            self._migrated.set()
+
+    def _migrate(self, legacy_json_path):
+        """One-time import of ``users.json`` (both the plain-password and dict formats)."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+                return
+        try:
+            with open(legacy_json_path, 'r') as f:
+                legacy_users = json.load(f)
+        except (TypeError, FileNotFoundError):
+            legacy_users = DEFAULT_USERS
+        except ValueError as e:
+            # Left unmarked, so a repaired file is imported on the next start
+            logger.error("not importing %s, it is not valid JSON: %s", legacy_json_path, e)
+            return
+        if not isinstance(legacy_users, dict):
+            logger.error("not importing %s, expected an object of users", legacy_json_path)
+            return
+        entries = []
+        for username, user_data in legacy_users.items():
+            if isinstance(user_data, str):  # Old format
+                password, email, created_at = user_data, None, None
+            else:  # New format
+                password = user_data.get('password', '')
+                email = user_data.get('email')
+                created_at = user_data.get('created_at')
+            entries.append((username, email, password, created_at))
+        start = time.perf_counter()
+        # hashlib.scrypt releases the GIL, so threads hash on every core
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='migration-hash') as pool:
+            hashes = list(pool.map(hash_password, [password for _, _, password, _ in entries]))
+        rows = [(username, email, password_hash, created_at)
+                for (username, email, _, created_at), password_hash in zip(entries, hashes)]
+        logger.info("hashed %d legacy users in %.1fs", len(rows), time.perf_counter() - start)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO users (username, email, password_hash, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)", (str(datetime.now()),))
+
+    def _fetch_one(self, query, args):
+        if not self._migrated.wait(HASH_WAIT_SECONDS):
+            raise StoreBusy("User accounts are still being imported, try again shortly")
+        with self._lock:
+            row = self._conn.execute(query, args).fetchone()
+        return dict(row) if row else None
+
+    def get_user(self, username):
+        return self._fetch_one("SELECT username, email, created_at FROM users WHERE username = ?", (username,))
+
+    def find_by_email(self, email):
+        return self._fetch_one("SELECT username, email, created_at FROM users WHERE email = ?", (email,))
+
+    def add_user(self, username, password, email=None):
+        password_hash = _hash_in_pool(hash_password, password)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO users (username, email, password_hash, created_at) VALUES (?, ?, ?, ?)",
+                    (username, email, password_hash, str(datetime.now()))
+                )
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def verify_password(self, username, password):
+        row = self._fetch_one("SELECT password_hash FROM users WHERE username = ?", (username,))
+        if row is None:
+            return False
+        return _hash_in_pool(check_password, password, row['password_hash'])
+
+
+USER_STORES = {
+    'sqlite': SQLiteUserStore,
+}
+
+
+def create_user_store(backend, *args, **kwargs):
+    """Instantiate a user store backend by name."""
+    if backend not in USER_STORES:
+        raise ValueError(f"Unknown user store backend: {backend}")
+    return USER_STORES[backend](*args, **kwargs)